@@ -1,11 +1,21 @@
 import os
+import sys
 import asyncio
 from googlesearch import search
-from pyppeteer import launch
 from pyppeteer.errors import NetworkError, PageError
 import websockets.exceptions
 from datetime import datetime
 
+# Shared helpers live alongside the newer Newscraper tool
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Newscraper"))
+from browser_pool import BrowserPool
+from scheduler import PoliteScheduler
+from dedup_index import DedupIndex, content_hash
+from extract import ExtractionPool, append_record
+from search_index import SearchIndex
+from readiness import ReadinessEngine
+from metrics import metrics
+
 # User agent to mimic Google bot
 user_agent = (
     "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
@@ -16,77 +26,113 @@ output_directory = "Saved_Articles"
 if not os.path.exists(output_directory):
     os.makedirs(output_directory)
 
-# Function to scrape and save an article with retries
-async def scrape_and_save_article(link, idx, search_query, max_retries=3):
-    for retry in range(max_retries):
-        try:
-            browser = await launch(headless=True)
-            page = await browser.newPage()
+# Long-lived browsers shared by every article and every query in this session
+browser_pool = BrowserPool(size=2, pages_per_browser=5, max_uses=50)
 
-            # Set user agent to mimic Google bot
-            await page.setUserAgent(user_agent)
+# Index of URLs and bodies captured by earlier runs, so nothing is fetched or stored twice
+dedup_index = DedupIndex(os.path.join(output_directory, "index.sqlite3"))
 
-            await page.goto(link)
+# Worker processes that turn raw HTML into structured records off the event loop
+extractor = ExtractionPool()
 
-            # Reduce wait time for page loads and selectors if the website is fast
-            await asyncio.sleep(2)  # Adjust the sleep time as needed
+# Full-text index updated as each article lands
+search_index = SearchIndex(os.path.join(output_directory, "search_index"))
 
-            # Get the entire HTML content of the page
-            page_content = await page.content()
+# Waits on real page readiness signals, with timeouts learned per domain
+readiness = ReadinessEngine(os.path.join(output_directory, "readiness.json"))
 
-            # Extract the article title from the page
-            title_element = await page.querySelector("your-title-selector")  # Replace with the actual selector
-            if title_element:
-                article_title = await title_element.evaluate('(element) => element.textContent')
+# Function to scrape and save an article with retries
+async def scrape_and_save_article(link, idx, search_query, max_retries=3):
+    for retry in range(max_retries):
+        try:
+            # Lease a recycled page from the pool instead of cold-starting Chromium
+            async with browser_pool.page() as page:
+                # Set user agent to mimic Google bot
+                await page.setUserAgent(user_agent)
+
+                # Navigate and wait until the article is rendered and the network is quiet
+                await readiness.goto(page, link)
+
+                # Get the entire HTML content of the page
+                with metrics.stage("content"):
+                    page_content = await page.content()
+
+            # Extract title, byline, date and text in a worker process
+            record = await extractor.extract(page_content, link)
+            article_title = record.get("title")
+            if article_title:
                 # Remove invalid characters from the title to create a valid filename
                 valid_title = ''.join(char for char in article_title if char.isalnum() or char.isspace())
             else:
                 valid_title = "UnknownTitle"
 
+            # Identical body already saved for another link or query: just reference it
+            digest = content_hash(page_content)
+            existing = dedup_index.body_path(digest)
+            if existing:
+                dedup_index.record(link, search_query, digest, existing, len(page_content), valid_title, page_content)
+                print(f"Article {idx + 1} is identical to {existing}, not stored again")
+                metrics.inc("articles_total", outcome="duplicate")
+                return
+
             # Create a filename with a timestamp, search query, and the article index
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
             file_name = os.path.join(output_directory, f"{timestamp}_{search_query}_{valid_title}_{idx + 1}.html")
 
             # Save the entire HTML content to the custom-named file
-            with open(file_name, "w", encoding="utf-8") as file:
+            with metrics.stage("store"), open(file_name, "w", encoding="utf-8") as file:
                 file.write(page_content)
+            metrics.inc("bytes_written_total", os.path.getsize(file_name), storage="files")
 
+            dedup_index.record(link, search_query, digest, file_name, len(page_content), valid_title, page_content)
+            record.update(path=file_name, query=search_query)
+            append_record(record, os.path.join(output_directory, "articles.jsonl"))
+            search_index.add(record)
             print(f"Article {idx + 1} saved: {file_name}")
+            metrics.inc("articles_total", outcome="saved")
             return  # Successfully scraped, exit retry loop
         except (NetworkError, PageError, websockets.exceptions.ConnectionClosedError) as e:
             print(f"Retrying (attempt {retry + 1}) - {str(e)}")
+            metrics.inc("retries_total", cause=type(e).__name__)
             # Add a delay before the next retry
             await asyncio.sleep(5)  # Adjust the delay time as needed
         except Exception as e:
             print(f"Failed to scrape and save article {idx + 1}: {str(e)}")
-        finally:
-            try:
-                await browser.close()
-            except Exception as e:
-                print(f"Error closing browser: {str(e)}")
 
     print(f"Failed to scrape and save article {idx + 1} after {max_retries} retries.")
+    metrics.inc("articles_total", outcome="failed")
 
 # Function to perform the scraping process
 async def scrape_articles(search_query):
     # Get search results from Google News
     search_results = search(query=search_query, tld='com', lang='en', num=10, stop=10, pause=2.0, extra_params={'tbm': 'nws'})
 
-    # Run the scraping function for each article link in parallel
-    tasks = []
+    # Skip links an earlier run already captured
+    search_results = dedup_index.filter_new(list(search_results), search_query)
+
+    # Schedule every article link politely: bounded overall, bounded per outlet, round-robin across outlets
+    scheduler = PoliteScheduler(concurrency=10, per_host=2, user_agent="Googlebot")
     for idx, link in enumerate(search_results):
         print(f"Scraping article {idx + 1}...")
-        tasks.append(scrape_and_save_article(link, idx, search_query))
-    await asyncio.gather(*tasks)
+        scheduler.submit(link, lambda link=link, idx=idx: scrape_and_save_article(link, idx, search_query))
+    await scheduler.run()
 
 # Main loop for user interaction
-while True:
-    search_query = input("Enter your search query (or 'exit' to quit): ")
-    
-    if search_query.lower() == 'exit':
-        break  # Exit the loop if the user enters 'exit'
-    
-    # Perform scraping for the entered search query
-    asyncio.get_event_loop().run_until_complete(scrape_articles(search_query))
-
-print("Scraping completed.")
+if __name__ == "__main__":
+    while True:
+        search_query = input("Enter your search query (or 'exit' to quit): ")
+
+        if search_query.lower() == 'exit':
+            break  # Exit the loop if the user enters 'exit'
+
+        # Perform scraping for the entered search query
+        asyncio.get_event_loop().run_until_complete(scrape_articles(search_query))
+
+    asyncio.get_event_loop().run_until_complete(browser_pool.close())
+    dedup_index.close()
+    extractor.close()
+    search_index.close()
+    readiness.save()
+    metrics.write(os.path.join(output_directory, "metrics.prom"))
+    print("\n".join(metrics.summary()))
+    print("Scraping completed.")
@@ -0,0 +1,230 @@
+# archive.py
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime
+import zstandard
+from dedup_index import DedupIndex, canonicalize_url, content_hash, index_file
+from metrics import metrics
+from utils import iter_chunks
+
+archive_directory = os.path.join("Saved_Articles", "archive")
+default_shard_bytes = 256 * 1024 * 1024
+
+schema = """
+CREATE TABLE IF NOT EXISTS records (
+    hash TEXT PRIMARY KEY,
+    url TEXT,
+    shard TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_url ON records (url);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+
+# shard-00001.jsonl.zst, or shard-w2-00001.jsonl.zst for one of several writer processes
+shard_name_re = re.compile(r"^shard-(?:([A-Za-z0-9]+)-)?(\d+)\.jsonl\.zst$")
+saved_name_re = re.compile(r"^(\d{14})_(.*)_(\d+)\.html$")
+source_link_re = re.compile(r"^<a href='([^']*)' target='_blank'>Source Article</a>\n\n")
+
+
+def locator(digest):
+    # What the dedup index stores as the "path" of an archived body
+    return f"archive:{digest}"
+
+
+class ShardedArchive:
+    """Append-only zstd-compressed JSONL shards with an offset index.
+
+    Every capture is one JSON line compressed as its own zstd frame, so a
+    shard is still a valid .zst stream (``zstdcat shard-00001.jsonl.zst``)
+    while any single record can be read back with one seek. Shards roll
+    over at ``max_shard_bytes``; ``index.sqlite3`` maps content hash and
+    canonical URL to (shard, offset, length).
+
+    Processes writing to one archive at the same time each need their own
+    ``writer`` name; each appends only to its own shards, while the index
+    and reads cover all of them.
+    """
+
+    def __init__(self, directory=archive_directory, max_shard_bytes=default_shard_bytes, level=10, writer=None):
+        self.directory = directory
+        self.writer = writer
+        self.max_shard_bytes = max_shard_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.compressor = zstandard.ZstdCompressor(level=level, write_content_size=True)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(schema)
+        self.shard = None
+        self.shard_file = None
+        self._open_latest_shard()
+
+    def _shards(self):
+        return sorted(name for name in os.listdir(self.directory) if shard_name_re.match(name))
+
+    def _open_latest_shard(self):
+        shards = [name for name in self._shards() if shard_name_re.match(name).group(1) == self.writer]
+        number = max(int(shard_name_re.match(name).group(2)) for name in shards) if shards else 1
+        self._open_shard(number)
+
+    def _open_shard(self, number):
+        if self.shard_file:
+            self.shard_file.close()
+        self.shard = f"shard-{self.writer}-{number:05d}.jsonl.zst" if self.writer else f"shard-{number:05d}.jsonl.zst"
+        self.shard_file = open(os.path.join(self.directory, self.shard), "ab")
+
+    def close(self):
+        if self.shard_file:
+            self.shard_file.close()
+            self.shard_file = None
+        self.conn.close()
+
+    def __contains__(self, digest):
+        return self.conn.execute("SELECT 1 FROM records WHERE hash = ?", (digest,)).fetchone() is not None
+
+    def put(self, url, page_content, digest=None, **meta):
+        """Append a capture unless an identical body is already archived; returns its locator.
+
+        The URL is recorded either way, so get_by_url finds a duplicate body too.
+        """
+        digest = digest or content_hash(page_content)
+        canonical = canonicalize_url(url) if url else None
+        if digest in self:
+            if canonical:
+                with self.conn:
+                    self.conn.execute("INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)", (canonical, digest))
+            return locator(digest)
+
+        record = {"url": url, "hash": digest, "captured_at": datetime.now().isoformat(timespec="seconds")}
+        record.update(meta)
+
+        offset = self.shard_file.tell()
+        # The compressed size isn't known up front, so a shard can overrun the limit by one record
+        if offset >= self.max_shard_bytes:
+            self._open_shard(int(shard_name_re.match(self.shard).group(2)) + 1)
+            offset = 0
+        # Stream the JSON line through the compressor in slices; "html" goes last so it can be
+        # escaped chunk by chunk instead of building the whole line in memory
+        writer = self.compressor.stream_writer(self.shard_file, closefd=False)
+        writer.write((json.dumps(record, ensure_ascii=False)[:-1] + ', "html": "').encode("utf-8"))
+        for chunk in iter_chunks(page_content):
+            writer.write(json.dumps(chunk, ensure_ascii=False)[1:-1].encode("utf-8"))
+        writer.write(b'"}\n')
+        writer.flush(zstandard.FLUSH_FRAME)
+        writer.close()
+        self.shard_file.flush()
+        length = self.shard_file.tell() - offset
+        metrics.inc("bytes_written_total", length, storage="archive")
+        # The frame is on disk before the index points at it, so a crash never leaves a dangling entry
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO records (hash, url, shard, offset, length) VALUES (?, ?, ?, ?, ?)",
+                              (digest, canonical, self.shard, offset, length))
+            if canonical:
+                self.conn.execute("INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)", (canonical, digest))
+        return locator(digest)
+
+    def _read(self, shard, offset, length):
+        if shard == self.shard:
+            self.shard_file.flush()
+        with open(os.path.join(self.directory, shard), "rb") as f:
+            f.seek(offset)
+            # Streamed frames carry no content size, which decompress() would need
+            return json.loads(self.decompressor.decompressobj().decompress(f.read(length)))
+
+    def get(self, digest):
+        row = self.conn.execute("SELECT shard, offset, length FROM records WHERE hash = ?", (digest,)).fetchone()
+        return self._read(*row) if row else None
+
+    def get_by_url(self, url):
+        canonical = canonicalize_url(url)
+        row = self.conn.execute("SELECT shard, offset, length FROM records"
+                                " WHERE hash = (SELECT hash FROM urls WHERE url = ?)", (canonical,)).fetchone()
+        if row is None:
+            # Archives written before the urls table only have each body's first URL
+            row = self.conn.execute("SELECT shard, offset, length FROM records WHERE url = ?"
+                                    " ORDER BY rowid DESC LIMIT 1", (canonical,)).fetchone()
+        return self._read(*row) if row else None
+
+    def __iter__(self):
+        """Stream every archived record, shard by shard."""
+        if self.shard_file:
+            self.shard_file.flush()
+        for shard in self._shards():
+            with open(os.path.join(self.directory, shard), "rb") as f:
+                reader = self.decompressor.stream_reader(f, read_across_frames=True)
+                buffer = b""
+                while True:
+                    chunk = reader.read(1 << 20)
+                    if not chunk:
+                        break
+                    buffer += chunk
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        if line:
+                            yield json.loads(line)
+
+
+def import_directory(directory, archive, index=None, delete=False):
+    """Move loose ``Saved_Articles`` .html files into ``archive``; returns how many were imported."""
+    imported = 0
+    # The index stores body paths relative to where the scraper ran, the parent of its Saved_Articles
+    root = os.path.dirname(os.path.dirname(index.path)) if index else None
+    for name in sorted(os.listdir(directory)):
+        match = saved_name_re.match(name)
+        if not match:
+            continue
+        path = os.path.join(directory, name)
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            page_content = f.read()
+        url = None
+        source = source_link_re.match(page_content)
+        if source:
+            url = source.group(1)
+            page_content = page_content[source.end():]
+
+        timestamp = datetime.strptime(match.group(1), "%Y%m%d%H%M%S").isoformat()
+        new_locator = archive.put(url, page_content, imported_from=name, captured_at=timestamp)
+        if index:
+            # Point dedup entries for the old file at the archived copy, however the directory was spelled
+            absolute = os.path.abspath(path)
+            with index.conn:
+                index.conn.execute("UPDATE bodies SET path = ? WHERE path IN (?, ?)",
+                                   (new_locator, os.path.relpath(absolute, root), absolute))
+        if delete:
+            os.remove(path)
+        imported += 1
+        if imported % 1000 == 0:
+            logging.info(f"Imported {imported} articles")
+    return imported
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Import loose Saved_Articles files into the sharded archive")
+    parser.add_argument("directory", nargs="?", default="Saved_Articles", help="Directory of saved .html files")
+    parser.add_argument("--archive", default=None, help="Archive directory (default: <directory>/archive)")
+    parser.add_argument("--delete", action="store_true", help="Remove each .html file once it is archived")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+    archive = ShardedArchive(args.archive or os.path.join(args.directory, "archive"))
+    index_path = os.path.join(args.directory, os.path.basename(index_file))
+    index = DedupIndex(index_path) if os.path.exists(index_path) else None
+    try:
+        count = import_directory(args.directory, archive, index, args.delete)
+    finally:
+        archive.close()
+        if index:
+            index.close()
+    logging.info(f"Imported {count} articles into {archive.directory}")
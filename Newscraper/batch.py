@@ -0,0 +1,100 @@
+# batch.py
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import time
+from job_queue import JobCheckpoint, JobQueue, queue_file
+from scraper import scrape_articles, scrape_proxies_from_url, proxy_list_url
+from browser_pool import BrowserPool
+from metrics import metrics
+
+
+def read_queries(source):
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line in stream:
+            query = line.strip()
+            if query and not query.startswith("#"):
+                yield query
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+async def keep_lease(queue, job_id, worker, interval):
+    while True:
+        await asyncio.sleep(interval)
+        queue.heartbeat(job_id, worker)
+
+
+async def run_worker(queue, worker, proxies, daemon=False, poll_interval=30, **scrape_options):
+    """Lease and run jobs until the queue is drained (or forever with ``daemon``)."""
+    while True:
+        job = queue.lease(worker)
+        if job is None:
+            if not daemon and not queue.pending_count():
+                return
+            # Sleep until the next backoff expires or new jobs could have arrived
+            wakeup = queue.next_wakeup()
+            delay = poll_interval if wakeup is None else min(poll_interval, max(1, wakeup - time.time()))
+            await asyncio.sleep(delay)
+            continue
+
+        logging.info(f"[{worker}] Job {job['id']} (attempt {job['attempts'] + 1}): {job['query']}")
+        heartbeat = asyncio.create_task(keep_lease(queue, job["id"], worker, queue.lease_seconds / 3))
+        try:
+            summary = await scrape_articles(job["query"], job["max_articles"], proxies,
+                                            checkpoint=JobCheckpoint(queue, job["id"]), **scrape_options)
+        except Exception as e:
+            queue.fail(job["id"], worker, e)
+        else:
+            if summary["failed"]:
+                # Finished articles are checkpointed, so the retry only redoes the failed ones
+                queue.fail(job["id"], worker, f"{summary['failed']} of {summary['links']} articles failed")
+            else:
+                queue.complete(job["id"], worker)
+                logging.info(f"[{worker}] Job {job['id']} done: {summary}")
+        finally:
+            heartbeat.cancel()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Run Newscraper queries non-interactively from a durable job queue")
+    parser.add_argument("queries", nargs="?", help="File with one query per line, or '-' for stdin")
+    parser.add_argument("--queue", default=queue_file, help="SQLite job queue path")
+    parser.add_argument("--max-articles", type=int, default=10, help="Articles per query")
+    parser.add_argument("--daemon", action="store_true", help="Keep polling for new jobs instead of exiting when idle")
+    parser.add_argument("--enqueue-only", action="store_true", help="Add the queries to the queue and exit")
+    parser.add_argument("--use-proxies", action="store_true", help="Load the public proxy list like the CLI does")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while running")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_arguments()
+    queue = JobQueue(args.queue)
+    runner = await metrics.serve(args.metrics_port) if args.metrics_port else None
+    # One Chromium for the whole run instead of a launch per job; started when a page first needs it
+    browsers = BrowserPool(size=1, pages_per_browser=8)
+    try:
+        if args.queries:
+            added = [queue.enqueue(query, args.max_articles) for query in read_queries(args.queries)]
+            logging.info(f"Queued {len(added)} queries")
+        if args.enqueue_only:
+            return
+        proxies = scrape_proxies_from_url(proxy_list_url) if args.use_proxies else []
+        # One job at a time per process; articles within a job are already fetched concurrently
+        await run_worker(queue, f"{socket.gethostname()}:{os.getpid()}", proxies, args.daemon, browsers=browsers)
+        logging.info(f"Queue state: {queue.summary()}")
+    finally:
+        await browsers.close()
+        queue.close()
+        if runner:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+# benchmark.py
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from aiohttp import web
+import link_resolver
+from scraper import scrape_articles
+from render_profile import profiles
+from metrics import metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+paragraph = ("<p>The council met on Tuesday to review the quarterly figures, which showed steady growth in "
+             "every region despite the disruption earlier in the year. Officials said the results reflected "
+             "long-term investment rather than a one-off gain, and cautioned against reading too much into a "
+             "single quarter. Analysts broadly agreed, noting that the comparison period had been unusually "
+             "weak and that several large contracts were still awaiting approval.</p>\n")
+
+
+# --- Stand-in site, run in its own process so it doesn't compete with the scraper's event loop ---
+
+def article_html(article_id, size, js):
+    title = f"Benchmark article {article_id}"
+    body = f"<p>Story number {article_id}.</p>\n" + paragraph * max(1, size // len(paragraph))
+    article = f"<article><h1>{title}</h1>\n{body}</article>"
+    if js:
+        # A client-rendered shell: no h1 or article until the script runs
+        return (f'<!doctype html><html lang="en"><head><title>{title}</title></head><body><div id="root"></div>'
+                f"<script>document.getElementById('root').innerHTML = {json.dumps(article)};</script></body></html>")
+    return (f'<!doctype html><html lang="en"><head><title>{title}</title>'
+            f'<meta name="author" content="Benchmark Desk"></head><body>{article}</body></html>')
+
+
+def build_site(config):
+    rng = random.Random(config["seed"])
+    js_pages = {i for i in range(config["articles"]) if rng.random() < config["js_fraction"]}
+    port = {}
+
+    def publisher_url(article_id):
+        host = f"127.0.0.{2 + article_id % config['publishers']}"
+        return f"http://{host}:{port['value']}/article/{article_id}"
+
+    async def delay():
+        latency = config["latency"] + rng.uniform(-config["jitter"], config["jitter"])
+        await asyncio.sleep(max(0.0, latency) / 1000)
+
+    async def search(request):
+        page = int(request.query.get("p", 0))
+        first = page * config["per_page"]
+        items = []
+        for article_id in range(first, min(first + config["per_page"], config["articles"])):
+            published = datetime.fromtimestamp(1700000000 - article_id * 600).isoformat() + "Z"
+            items.append(f'<article><a href="/rd/{article_id}">Benchmark article {article_id}</a>'
+                         f'<time datetime="{published}"></time></article>')
+        return web.Response(text=f"<html><body><main>{''.join(items)}</main></body></html>", content_type="text/html")
+
+    async def feed(request):
+        items = []
+        base = f"http://127.0.0.1:{port['value']}"
+        for article_id in range(config["articles"]):
+            published = format_datetime(datetime.fromtimestamp(1700000000 - article_id * 600, timezone.utc))
+            items.append(f"<item><title>Benchmark article {article_id}</title><link>{base}/rd/{article_id}</link>"
+                         f"<pubDate>{published}</pubDate><source url=\"{publisher_url(article_id)}\">Publisher</source></item>")
+        return web.Response(text=f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                                 f"{''.join(items)}</channel></rss>", content_type="application/rss+xml")
+
+    async def redirect(request):
+        article_id = int(request.match_info["article_id"])
+        hop = int(request.query.get("hop", 1))
+        if hop < config["hops"]:
+            raise web.HTTPFound(f"/rd/{article_id}?hop={hop + 1}")
+        raise web.HTTPFound(publisher_url(article_id))
+
+    async def article(request):
+        article_id = int(request.match_info["article_id"])
+        await delay()
+        return web.Response(text=article_html(article_id, config["size"], article_id in js_pages),
+                            content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/search", search)
+    app.router.add_get("/rss/search", feed)
+    app.router.add_get("/rd/{article_id}", redirect)
+    app.router.add_get("/article/{article_id}", article)
+    return app, port
+
+
+def serve_site(config, ready):
+    async def main():
+        app, port = build_site(config)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        # Every publisher gets its own loopback address so per-host limits behave as on the real web
+        first = web.TCPSite(runner, "127.0.0.1", 0)
+        await first.start()
+        port["value"] = runner.addresses[0][1]
+        for i in range(config["publishers"]):
+            await web.TCPSite(runner, f"127.0.0.{2 + i}", port["value"]).start()
+        ready.put(port["value"])
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+# --- Harness ---
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def stage(name):
+    return metrics.histograms.get(("stage_seconds", (("stage", name),)))
+
+
+async def run_benchmark(args, base_url):
+    result = {"started_at": datetime.now().isoformat(timespec="seconds"), "params": benchmark_params(args)}
+    # The stand-in's /rd/ links play Google News redirects, so LinkResolver resolves them as it would those
+    link_resolver.redirect_hosts = link_resolver.redirect_hosts + ("127.0.0.1",)
+
+    # The same call the CLI, batch.py and monitor.py make; Chromium starts only if a page needs it
+    started = time.perf_counter()
+    summary = await scrape_articles("benchmark", args.articles, [], concurrency=args.concurrency,
+                                    per_host=args.per_host, storage=args.storage, render_profile=args.profile,
+                                    max_inflight_bytes=args.budget_mb * 1024 * 1024, discovery=args.discovery,
+                                    feed_url=base_url + "/rss/search?q={query}",
+                                    search_url=base_url + "/search?q={query}&p={page}")
+    total_seconds = time.perf_counter() - started
+
+    discover, resolve, article = stage("discover"), stage("resolve"), stage("article")
+    discovery_seconds = discover.sum if discover else 0.0
+    resolve_seconds = resolve.sum if resolve else 0.0
+    capture_seconds = total_seconds - discovery_seconds - resolve_seconds
+    result.update(
+        links=summary["links"],
+        saved=summary["saved"],
+        failed=summary["failed"],
+        discovery_seconds=round(discovery_seconds, 3),
+        resolve_seconds=round(resolve_seconds, 3),
+        capture_seconds=round(capture_seconds, 3),
+        articles_per_second=round(summary["saved"] / capture_seconds, 2) if capture_seconds > 0 else None,
+        # Bucket upper bounds, as Prometheus would estimate them from the same histogram
+        p50=article.quantile(0.50) if article else None,
+        p95=article.quantile(0.95) if article else None,
+        p99=article.quantile(0.99) if article else None,
+        browser_pages=metrics.counters.get(("fetches_total", (("path", "browser"),)), 0),
+        peak_rss_mb=peak_rss_mb(),
+        peak_budget_mb=round(summary.get("peak_bytes", 0) / 1024 / 1024, 1),
+    )
+    return result
+
+
+def benchmark_params(args):
+    return {name: getattr(args, name) for name in ("articles", "per_page", "size", "js_fraction", "latency", "jitter",
+                                                   "hops", "publishers", "concurrency", "per_host", "profile",
+                                                   "storage", "budget_mb", "discovery")}
+
+
+def previous_result(path, params):
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("params") == params:
+                previous = entry
+    return previous
+
+
+def report(result, previous):
+    print(f"Discovery: {result['links']} links in {result['discovery_seconds']:.2f}s,"
+          f" redirects resolved in {result['resolve_seconds']:.2f}s")
+    print(f"Capture: {result['saved']} saved ({result['browser_pages']:g} through the browser), {result['failed']} failed"
+          f" in {result['capture_seconds']:.2f}s = {result['articles_per_second']} articles/s")
+    if result["p50"] is not None:
+        print(f"Per-article latency: p50 <= {result['p50']:g}s, p95 <= {result['p95']:g}s, p99 <= {result['p99']:g}s")
+    print(f"Peak RSS (scraper process): {result['peak_rss_mb']} MB,"
+          f" page bytes in flight peaked at {result['peak_budget_mb']} MB")
+    if previous:
+        for key, better in (("articles_per_second", "higher"), ("p95", "lower"), ("peak_rss_mb", "lower")):
+            if previous.get(key) and result.get(key) is not None:
+                change = (result[key] - previous[key]) / previous[key] * 100
+                print(f"  {key}: {previous[key]} -> {result[key]} ({change:+.1f}%, {better} is better)")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the capture pipeline against a local stand-in news site")
+    parser.add_argument("--articles", type=int, default=100, help="Number of articles on the stand-in site")
+    parser.add_argument("--per-page", type=int, default=20, help="Results per search page")
+    parser.add_argument("--size", type=int, default=80, help="Article page size in KB")
+    parser.add_argument("--js-fraction", type=float, default=0.2,
+                        help="Share of pages that only render with JavaScript (needs Chromium unless 0)")
+    parser.add_argument("--latency", type=float, default=50, help="Publisher response latency in ms")
+    parser.add_argument("--jitter", type=float, default=25, help="Random +/- latency in ms")
+    parser.add_argument("--hops", type=int, default=1, help="Redirect hops before the publisher page")
+    parser.add_argument("--publishers", type=int, default=8, help="Distinct publisher hosts (127.0.0.2 onwards)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--budget-mb", type=int, default=64, help="Page bytes allowed in flight at once")
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--profile", choices=sorted(profiles), default="text")
+    parser.add_argument("--storage", choices=("archive", "files"), default="archive")
+    parser.add_argument("--discovery", choices=("rss", "browser"), default="rss",
+                        help="Find links through the stand-in news feed or the search page in Chromium")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmarks.jsonl", help="Append results here and compare with the last matching run")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary Saved_Articles directory")
+    return parser.parse_args()
+
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    args = parse_arguments()
+    args.size *= 1024
+    output = os.path.abspath(args.output)
+    config = {key: getattr(args, key) for key in ("articles", "per_page", "size", "js_fraction", "latency", "jitter",
+                                                  "hops", "publishers", "seed")}
+
+    ready = multiprocessing.Queue()
+    site = multiprocessing.Process(target=serve_site, args=(config, ready), daemon=True)
+    site.start()
+    workdir = tempfile.mkdtemp(prefix="newscraper-bench-")
+    cwd = os.getcwd()
+    try:
+        port = ready.get(timeout=30)
+        # Every store uses paths relative to Saved_Articles, so a scratch cwd keeps real data untouched
+        os.chdir(workdir)
+        os.makedirs("Saved_Articles", exist_ok=True)
+        result = asyncio.run(run_benchmark(args, f"http://127.0.0.1:{port}"))
+    finally:
+        os.chdir(cwd)
+        site.terminate()
+        if args.keep:
+            print(f"Kept benchmark data in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    previous = previous_result(output, result["params"])
+    report(result, previous)
+    logging.getLogger().setLevel(logging.INFO)
+    metrics.summary()
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
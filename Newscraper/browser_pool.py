@@ -0,0 +1,215 @@
+# browser_pool.py
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from pyppeteer import launch
+from pyppeteer.browser import Browser
+
+# Default launch arguments shared by every pooled Chromium
+default_launch_options = {
+    'headless': True,
+    'args': ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage'],
+    # Let the pool own the process lifetime instead of pyppeteer's signal handlers
+    'handleSIGINT': False,
+    'handleSIGTERM': False,
+    'handleSIGHUP': False,
+}
+
+
+class PageSlot:
+    """A recyclable page living in its own incognito context."""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        # Every origin any frame has loaded since the last reset, whose storage reset() must clear
+        self.origins = set()
+        page.on('framenavigated', self._remember_origin)
+
+    def _remember_origin(self, frame):
+        parts = urlsplit(frame.url)
+        if parts.scheme in ('http', 'https'):
+            self.origins.add(f'{parts.scheme}://{parts.netloc}')
+
+    async def is_healthy(self, timeout=5):
+        if self.page.isClosed():
+            return False
+        try:
+            return await asyncio.wait_for(self.page.evaluate('1 + 1'), timeout) == 2
+        except Exception:
+            return False
+
+    async def reset(self):
+        # Undo what the lease set up on the page: request handlers, interception and disabled JavaScript
+        self.page.remove_all_listeners('request')
+        await self.page.setRequestInterception(False)
+        await self.page.setJavaScriptEnabled(True)
+        # Drop cookies, cache and storage from the previous lease so contexts stay isolated.
+        # sessionStorage belongs to the tab, so clear it while the page is still on the origin
+        try:
+            await self.page.evaluate('() => { try { sessionStorage.clear() } catch (e) {} }')
+        except Exception as e:
+            logging.debug(f"Could not clear sessionStorage: {e}")
+        # Then leave the page, so it can't write its storage again after it is cleared
+        await self.page.goto('about:blank')
+        client = self.page._client
+        await client.send('Network.clearBrowserCookies')
+        await client.send('Network.clearBrowserCache')
+        for origin in self.origins:
+            # localStorage, sessionStorage, IndexedDB, service workers, cache storage, ...
+            await client.send('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+        self.origins.clear()
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception as e:
+            logging.debug(f"Error closing browser context: {e}")
+
+
+class PooledBrowser:
+    def __init__(self, index, launch_options, max_uses):
+        self.index = index
+        self.launch_options = launch_options
+        self.max_uses = max_uses
+        self.browser = None
+        self.uses = 0
+        self.leased = 0
+        self.idle = []
+        self.crashed = False
+
+    @property
+    def draining(self):
+        return self.uses >= self.max_uses
+
+    @property
+    def alive(self):
+        if self.browser is None or self.crashed:
+            return False
+        process = self.browser.process
+        return process is None or process.poll() is None
+
+    async def start(self):
+        self.browser = await launch(**self.launch_options)
+        self.browser.on(Browser.Events.Disconnected, self._on_disconnected)
+        self.uses = 0
+        self.crashed = False
+        logging.info(f"Browser {self.index} started")
+
+    def _on_disconnected(self):
+        self.crashed = True
+
+    async def restart(self, reason):
+        logging.info(f"Restarting browser {self.index} ({reason})")
+        await self.close()
+        await self.start()
+
+    async def acquire(self):
+        self.uses += 1
+        self.leased += 1
+        while self.idle:
+            slot = self.idle.pop()
+            if await slot.is_healthy():
+                return slot
+            await slot.close()
+        try:
+            context = await self.browser.createIncognitoBrowserContext()
+            return PageSlot(context, await context.newPage())
+        except Exception:
+            self.leased -= 1
+            raise
+
+    async def release(self, slot, healthy=True):
+        self.leased -= 1
+        if healthy and self.alive and not self.draining:
+            try:
+                await slot.reset()
+                self.idle.append(slot)
+                return
+            except Exception as e:
+                logging.debug(f"Discarding page after failed reset: {e}")
+        await slot.close()
+
+    async def close(self):
+        for slot in self.idle:
+            await slot.close()
+        self.idle = []
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception as e:
+                logging.error(f"Error closing browser {self.index}: {e}")
+        self.browser = None
+
+
+class BrowserPool:
+    """Long-lived Chromium instances that lease out recycled, isolated pages.
+
+    Each browser is restarted after ``max_uses`` leases or as soon as it
+    crashes; at most ``size * pages_per_browser`` pages are leased at once.
+    """
+
+    def __init__(self, size=2, pages_per_browser=4, max_uses=50, launch_options=None):
+        self.launch_options = dict(default_launch_options, **(launch_options or {}))
+        self.browsers = [PooledBrowser(i, self.launch_options, max_uses) for i in range(size)]
+        self.pages_per_browser = pages_per_browser
+        self._slots = asyncio.Semaphore(size * pages_per_browser)
+        self._lock = asyncio.Lock()
+        self._started = False
+
+    async def start(self):
+        # Locked so the first pages leased concurrently don't each launch the browsers
+        async with self._lock:
+            if not self._started:
+                await asyncio.gather(*(b.start() for b in self.browsers))
+                self._started = True
+        return self
+
+    async def close(self):
+        await asyncio.gather(*(b.close() for b in self.browsers))
+        self._started = False
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _pick_browser(self):
+        async with self._lock:
+            for pooled in self.browsers:
+                # Recycle browsers that crashed or hit their use budget once nothing is leased
+                if not pooled.alive and pooled.leased == 0:
+                    await pooled.restart("crashed")
+                elif pooled.draining and pooled.leased == 0:
+                    await pooled.restart(f"reached {pooled.max_uses} uses")
+
+            candidates = [b for b in self.browsers
+                          if b.alive and not b.draining and b.leased < self.pages_per_browser]
+            if not candidates:
+                # Every browser is draining with pages still out; overshoot the budget rather than stall
+                candidates = [b for b in self.browsers if b.alive and b.leased < self.pages_per_browser]
+            if not candidates:
+                # Only crashed browsers have room left; their outstanding pages are dead anyway
+                pooled = next(b for b in self.browsers if not b.alive)
+                await pooled.restart("crashed")
+                return pooled
+            return min(candidates, key=lambda b: b.leased)
+
+    @asynccontextmanager
+    async def page(self):
+        """Lease a health-checked page; it is reset and returned to the pool on exit."""
+        if not self._started:
+            await self.start()
+        async with self._slots:
+            pooled = await self._pick_browser()
+            slot = await pooled.acquire()
+            healthy = True
+            try:
+                yield slot.page
+            except Exception:
+                healthy = False
+                raise
+            finally:
+                await pooled.release(slot, healthy=healthy and not slot.page.isClosed())
@@ -0,0 +1,135 @@
+# crawl.py
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import socket
+import time
+from batch import read_queries, run_worker
+from job_queue import JobQueue, queue_file
+from extract import ExtractionPool, append_record
+from browser_pool import BrowserPool
+from search_index import SearchIndex
+from metrics import Metrics, metrics
+from scraper import scrape_proxies_from_url, proxy_list_url
+
+
+async def report_metrics(number, results, interval):
+    while True:
+        await asyncio.sleep(interval)
+        results.put(("metrics", number, metrics.snapshot()))
+
+
+async def run_crawl_worker(number, queue_path, results, proxies, options, report_interval):
+    queue = JobQueue(queue_path)
+    # Every worker process is already one core's worth of crawling, so one extraction process each is
+    # enough; it lives as long as the worker instead of being started and torn down per query
+    extractor = ExtractionPool(workers=1)
+    # Likewise one Chromium per worker, launched on the first page it needs and reused for every query
+    browsers = BrowserPool(size=1, pages_per_browser=options["concurrency"])
+    reporter = asyncio.create_task(report_metrics(number, results, report_interval))
+    try:
+        # Same lease/retry loop as batch.py; only storage of the finished records differs
+        await run_worker(queue, f"{socket.gethostname()}:{os.getpid()}:w{number}", proxies, poll_interval=5,
+                         record_sink=lambda record: results.put(("record", record)),
+                         archive_writer=f"w{number}", extractor=extractor, browsers=browsers,
+                         **options)
+    finally:
+        reporter.cancel()
+        await browsers.close()
+        extractor.close()
+        results.put(("metrics", number, metrics.snapshot()))
+        queue.close()
+
+
+def worker_main(number, queue_path, results, proxies, options, report_interval=5):
+    # The coordinator writes the merged metrics file; a worker writing its own would overwrite it
+    metrics.path = None
+    asyncio.run(run_crawl_worker(number, queue_path, results, proxies, options, report_interval))
+
+
+async def coordinate(args, proxies):
+    """Start the workers and own everything that must have a single writer until they are done."""
+    options = {"concurrency": args.concurrency, "per_host": args.per_host, "storage": args.storage,
+               "render_profile": args.profile}
+    # spawn, not fork: each worker gets a clean interpreter, event loop and SQLite connections
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=worker_main, args=(number, args.queue, results, proxies, options),
+                               name=f"crawl-w{number}")
+               for number in range(1, args.workers + 1)]
+    for worker in workers:
+        worker.start()
+    logging.info(f"Started {len(workers)} crawl workers")
+
+    search = SearchIndex()
+    merged = Metrics()
+    snapshots = {}
+    records = 0
+    last_write = time.monotonic()
+    runner = await merged.serve(args.metrics_port) if args.metrics_port else None
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                message = await loop.run_in_executor(None, results.get, True, 1.0)
+            except queue_module.Empty:
+                # A finished worker has flushed everything it sent, so empty and all exited means done
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            if message[0] == "record":
+                append_record(message[1])
+                search.add(message[1])
+                records += 1
+            elif message[0] == "metrics":
+                snapshots[message[1]] = message[2]
+                merged.merge(snapshots.values())
+                if time.monotonic() - last_write >= 10:
+                    merged.write()
+                    last_write = time.monotonic()
+    finally:
+        for worker in workers:
+            worker.join()
+        search.close()
+        merged.merge(snapshots.values())
+        merged.write()
+        merged.summary()
+        if runner:
+            await runner.cleanup()
+    logging.info(f"Indexed {records} articles from {len(workers)} workers")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Crawl many queries with one worker process per core")
+    parser.add_argument("queries", nargs="?", help="File with one query per line, or '-' for stdin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    parser.add_argument("--queue", default=queue_file, help="SQLite job queue path")
+    parser.add_argument("--max-articles", type=int, default=10, help="Articles per query")
+    parser.add_argument("--concurrency", type=int, default=8, help="Pages in flight per worker")
+    parser.add_argument("--per-host", type=int, default=2, help="Pages in flight per outlet per worker")
+    parser.add_argument("--storage", choices=("archive", "files"), default="archive")
+    parser.add_argument("--profile", default="text", help="Render profile: full, text or static")
+    parser.add_argument("--use-proxies", action="store_true", help="Load the public proxy list like the CLI does")
+    parser.add_argument("--metrics-port", type=int, help="Serve merged Prometheus metrics on this port")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.queries:
+        queue = JobQueue(args.queue)
+        added = [queue.enqueue(query, args.max_articles) for query in read_queries(args.queries)]
+        queue.close()
+        logging.info(f"Queued {len(added)} queries")
+    proxies = scrape_proxies_from_url(proxy_list_url) if args.use_proxies else []
+    asyncio.run(coordinate(args, proxies))
+    queue = JobQueue(args.queue)
+    logging.info(f"Queue state: {queue.summary()}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
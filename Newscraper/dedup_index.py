@@ -0,0 +1,135 @@
+# dedup_index.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from utils import iter_chunks
+
+index_file = os.path.join("Saved_Articles", "index.sqlite3")
+
+# Query parameters that only track where a click came from
+tracking_params = {"fbclid", "gclid", "dclid", "msclkid", "ocid", "cmpid", "mc_cid", "mc_eid",
+                   "ref", "ref_src", "smid", "cid", "_ga", "igshid"}
+
+canonical_link_re = re.compile(
+    r"""<link\b[^>]*\brel=["']?canonical["']?[^>]*>""", re.IGNORECASE)
+href_re = re.compile(r"""\bhref=["']([^"']+)["']""", re.IGNORECASE)
+
+schema = """
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    first_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL REFERENCES bodies(hash),
+    fetched_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    query TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    added_at TEXT NOT NULL,
+    PRIMARY KEY (query, url)
+);
+"""
+
+
+def canonicalize_url(url):
+    """Normalise a URL so trivially different links to one article compare equal."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith("utm_") and k.lower() not in tracking_params)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme,
+                       host, path, urlencode(query), ""))
+
+
+def find_canonical_link(page_content):
+    tag = canonical_link_re.search(page_content)
+    if tag:
+        href = href_re.search(tag.group(0))
+        if href and href.group(1).startswith(("http://", "https://")):
+            return href.group(1)
+    return None
+
+
+def content_hash(page_content):
+    # Same digest as hashing the whole encoded body, without holding a second copy of it
+    digest = hashlib.sha256()
+    for chunk in iter_chunks(page_content):
+        digest.update(chunk.encode("utf-8", errors="replace"))
+    return digest.hexdigest()
+
+
+class DedupIndex:
+    """Persistent record of fetched URLs and stored bodies shared by every run.
+
+    Each body is stored once (keyed by its SHA-256); every canonical URL
+    points at a body, and every query that returned a URL gets a
+    reference row instead of another copy of the file.
+    """
+
+    def __init__(self, path=index_file):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Several crawl workers may write at once; wait for the lock instead of failing
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(schema)
+
+    def close(self):
+        self.conn.close()
+
+    def seen_url(self, url):
+        row = self.conn.execute("SELECT 1 FROM urls WHERE url = ?", (canonicalize_url(url),)).fetchone()
+        return row is not None
+
+    def body_path(self, digest):
+        row = self.conn.execute("SELECT path FROM bodies WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def add_reference(self, url, query, title=None):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO refs (query, url, title, added_at) VALUES (?, ?, ?, ?)",
+                              (query, canonicalize_url(url), title, now))
+
+    def record(self, url, query, digest, path, size, title=None, page_content=None):
+        """Register a fetched article; ``path`` is where its body lives."""
+        now = datetime.now().isoformat(timespec="seconds")
+        urls = {canonicalize_url(url)}
+        # Also remember the publisher's own canonical URL so other links to it are skipped
+        declared = find_canonical_link(page_content) if page_content else None
+        if declared:
+            urls.add(canonicalize_url(declared))
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO bodies (hash, path, size, first_seen) VALUES (?, ?, ?, ?)",
+                              (digest, path, size, now))
+            for canonical in urls:
+                self.conn.execute("INSERT OR REPLACE INTO urls (url, hash, fetched_at) VALUES (?, ?, ?)",
+                                  (canonical, digest, now))
+                self.conn.execute("INSERT OR IGNORE INTO refs (query, url, title, added_at) VALUES (?, ?, ?, ?)",
+                                  (query, canonical, title, now))
+
+    def filter_new(self, links, query):
+        """Split ``links`` into unseen ones; already-known URLs just gain a reference for ``query``."""
+        new_links = []
+        for link in links:
+            if link and self.seen_url(link):
+                self.add_reference(link, query)
+                logging.info(f"Skipping already captured article: {link}")
+            else:
+                new_links.append(link)
+        return new_links
@@ -0,0 +1,210 @@
+# extract.py
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from lxml import etree, html as lxml_html
+
+records_file = os.path.join("Saved_Articles", "articles.jsonl")
+
+# Elements that never hold article body text
+boilerplate_tags = ["script", "style", "noscript", "nav", "footer", "aside", "form", "header", "iframe", "svg"]
+
+source_link_re = re.compile(r"^<a href='([^']*)' target='_blank'>Source Article</a>")
+whitespace_re = re.compile(r"\s+")
+
+
+def _clean(text):
+    return whitespace_re.sub(" ", text or "").strip()
+
+
+def _first(tree, *xpaths):
+    for xpath in xpaths:
+        for value in tree.xpath(xpath):
+            value = _clean(value if isinstance(value, str) else value.text_content())
+            if value:
+                return value
+    return None
+
+
+def _json_ld(tree):
+    # schema.org NewsArticle blocks carry the most reliable author/date metadata
+    for script in tree.xpath('//script[@type="application/ld+json"]/text()'):
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+        items = data if isinstance(data, list) else data.get("@graph", [data]) if isinstance(data, dict) else []
+        for item in items:
+            if isinstance(item, dict) and "Article" in str(item.get("@type", "")):
+                return item
+    return {}
+
+
+def _ld_author(ld):
+    author = ld.get("author")
+    if isinstance(author, list):
+        names = [a.get("name") if isinstance(a, dict) else a for a in author]
+        return ", ".join(n for n in names if n) or None
+    if isinstance(author, dict):
+        return author.get("name")
+    return author if isinstance(author, str) else None
+
+
+def _main_text(tree):
+    for bad in tree.xpath("//" + " | //".join(boilerplate_tags)):
+        bad.drop_tree()
+
+    candidates = tree.xpath("//article") or tree.xpath("//main") or tree.xpath('//*[@role="main"]')
+    if candidates:
+        root = max(candidates, key=lambda el: len(el.text_content()))
+    else:
+        # No semantic container: take the element holding the most paragraph text
+        scores = {}
+        for p in tree.xpath("//p"):
+            parent = p.getparent()
+            if parent is not None:
+                scores[parent] = scores.get(parent, 0) + len(p.text_content())
+        root = max(scores, key=scores.get) if scores else tree
+
+    paragraphs = [_clean(p.text_content()) for p in root.xpath(".//p | .//li | .//h2 | .//h3")]
+    paragraphs = [p for p in paragraphs if p]
+    return "\n\n".join(paragraphs) if paragraphs else _clean(root.text_content())
+
+
+def extract_article(page_content, url=None):
+    """Turn raw article HTML into a structured record. Safe to run in a worker process."""
+    match = source_link_re.match(page_content)
+    if match:
+        # Saved files start with a link back to the source; it is not part of the page
+        url = url or match.group(1)
+        page_content = page_content[match.end():]
+    try:
+        tree = lxml_html.fromstring(page_content)
+    except (ValueError, etree.ParserError) as e:
+        return {"url": url, "error": str(e)}
+
+    ld = _json_ld(tree)
+    record = {
+        "url": url,
+        "canonical_url": _first(tree, '//link[@rel="canonical"]/@href', '//meta[@property="og:url"]/@content') or ld.get("url"),
+        "title": _first(tree, '//meta[@property="og:title"]/@content', "//h1", "//title") or ld.get("headline"),
+        "byline": _first(tree, '//meta[@name="author"]/@content', '//meta[@property="article:author"]/@content',
+                         '//*[@rel="author"]', '//*[@itemprop="author"]', '//*[contains(@class, "byline")]')
+                  or _ld_author(ld),
+        "published": _first(tree, '//meta[@property="article:published_time"]/@content',
+                            '//meta[@itemprop="datePublished"]/@content', '//*[@itemprop="datePublished"]/@datetime',
+                            '//time/@datetime') or ld.get("datePublished"),
+        "language": _first(tree, "//html/@lang", '//meta[@http-equiv="content-language"]/@content',
+                           '//meta[@property="og:locale"]/@content'),
+    }
+    record["text"] = _main_text(tree)
+    if record["language"]:
+        record["language"] = record["language"].replace("_", "-").split("-")[0].lower()
+    return record
+
+
+def _extract_file(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            record = extract_article(f.read())
+    except OSError as e:
+        record = {"error": str(e)}
+    record["path"] = path
+    return record
+
+
+class ExtractionPool:
+    """Runs extract_article in worker processes so parsing never blocks the event loop."""
+
+    def __init__(self, workers=None):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    async def extract(self, page_content, url=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, extract_article, page_content, url)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def append_record(record, path=records_file):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def extract_directory(directory, output_path=None, workers=None):
+    """Re-process every saved .html file in ``directory``; yields records as they finish."""
+    paths = sorted(os.path.join(root, name)
+                   for root, _, names in os.walk(directory) for name in names if name.endswith(".html"))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        out = open(output_path, "w", encoding="utf-8") if output_path else None
+        try:
+            # Large chunks keep pickling overhead small relative to parse time
+            chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+            for record in executor.map(_extract_file, paths, chunksize=chunksize):
+                if out:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                yield record
+        finally:
+            if out:
+                out.close()
+
+
+def _extract_archived(record):
+    extracted = extract_article(record["html"], record.get("url"))
+    extracted.update(hash=record.get("hash"), query=record.get("query"))
+    return extracted
+
+
+def extract_archive(directory, output_path=None, workers=None):
+    """Same as extract_directory, for captures stored in a ShardedArchive; yields records as they finish.
+
+    At most a few captures per worker are read ahead, so memory stays flat
+    however large the archive is (Executor.map would submit all of them).
+    """
+    from archive import ShardedArchive
+    archive = ShardedArchive(directory)
+    window = (workers or os.cpu_count() or 1) * 4
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            out = open(output_path, "w", encoding="utf-8") if output_path else None
+            try:
+                captures = iter(archive)
+                pending = {executor.submit(_extract_archived, capture)
+                           for capture in itertools.islice(captures, window)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    pending.update(executor.submit(_extract_archived, capture)
+                                   for capture in itertools.islice(captures, len(done)))
+                    for future in done:
+                        record = future.result()
+                        if out:
+                            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        yield record
+            finally:
+                if out:
+                    out.close()
+    finally:
+        archive.close()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Extract structured records from saved articles")
+    parser.add_argument("directory", nargs="?", default="Saved_Articles", help="Directory of saved .html files")
+    parser.add_argument("-o", "--output", default="articles.jsonl", help="JSONL file to write records to")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--archive", action="store_true", help="Treat the directory as a sharded archive")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+    batch = extract_archive if args.archive else extract_directory
+    count = sum(1 for _ in batch(args.directory, args.output, args.workers))
+    logging.info(f"Extracted {count} articles to {args.output}")
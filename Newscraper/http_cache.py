@@ -0,0 +1,238 @@
+# http_cache.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from email.utils import parsedate_to_datetime
+from metrics import metrics
+
+cache_directory = os.path.join("Saved_Articles", "http_cache")
+default_max_bytes = 512 * 1024 * 1024
+
+# Headers worth replaying to a browser page served from the cache
+replay_headers = ("content-type", "content-language", "etag", "last-modified", "cache-control")
+
+schema = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+charset_re = re.compile(r"charset=([\w.:-]+)", re.IGNORECASE)
+
+
+def parse_cache_control(value):
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"')
+    return directives
+
+
+def expiry_from_headers(headers, now):
+    """Absolute time until which a response may be served without revalidating."""
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in directives or ("must-revalidate" in directives and "max-age" not in directives):
+        return now
+    if "max-age" in directives:
+        try:
+            return now + max(0, int(directives["max-age"]) - int(headers.get("Age", 0) or 0))
+        except ValueError:
+            return now
+    if headers.get("Expires"):
+        try:
+            return parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            return now
+    # No explicit lifetime: always revalidate, the validators still make that cheap
+    return now
+
+
+class CachedResponse:
+    def __init__(self, status, url, body, content_type=None, headers=None, from_cache=False):
+        self.status = status
+        self.url = url
+        self.body = body
+        self.content_type = content_type or ""
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+    def text(self):
+        match = charset_re.search(self.content_type)
+        encoding = match.group(1) if match else "utf-8"
+        try:
+            return self.body.decode(encoding, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+
+class HttpCache:
+    """On-disk HTTP cache with ETag / Last-Modified revalidation and LRU eviction.
+
+    Bodies live in ``directory`` named by the SHA-256 of their URL, metadata
+    in a small SQLite table next to them. Fresh entries (per Cache-Control
+    max-age or Expires) are served without touching the network; stale ones
+    are revalidated with If-None-Match / If-Modified-Since, so an unchanged
+    page costs a 304 instead of a full download.
+    """
+
+    def __init__(self, directory=cache_directory, max_bytes=default_max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "cache.sqlite3"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(schema)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+        logging.info(f"HTTP cache: {self.hits} fresh hits, {self.revalidated} revalidated (304), {self.misses} misses")
+
+    def _body_path(self, url):
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def lookup(self, url):
+        row = self.conn.execute(
+            "SELECT final_url, status, content_type, etag, last_modified, expires_at FROM entries WHERE url = ?",
+            (url,)).fetchone()
+        if row is None:
+            return None
+        path = self._body_path(url)
+        if not os.path.exists(path):
+            self.delete(url)
+            return None
+        return dict(zip(("final_url", "status", "content_type", "etag", "last_modified", "expires_at"), row))
+
+    def read_body(self, url):
+        with open(self._body_path(url), "rb") as f:
+            return f.read()
+
+    def store(self, url, final_url, status, headers, body):
+        if "no-store" in parse_cache_control(headers.get("Cache-Control")):
+            return
+        path = self._body_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Per-process temp name so workers storing the same URL don't write into one file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (url, final_url, status, content_type, etag, last_modified,"
+                " expires_at, size, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, final_url, status, headers.get("Content-Type"), headers.get("ETag"),
+                 headers.get("Last-Modified"), expiry_from_headers(headers, now), len(body), now))
+        self.evict()
+
+    def refresh(self, url, headers):
+        # A 304 may carry new validators or a new lifetime
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE entries SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified),"
+                " expires_at = ?, last_access = ? WHERE url = ?",
+                (headers.get("ETag"), headers.get("Last-Modified"), expiry_from_headers(headers, now), now, url))
+
+    def touch(self, url):
+        with self.conn:
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+
+    def delete(self, url):
+        with self.conn:
+            self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+        try:
+            os.remove(self._body_path(url))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict least recently used entries down to 90% of the cap so we don't evict on every store
+        target = int(self.max_bytes * 0.9)
+        for url, size in self.conn.execute("SELECT url, size FROM entries ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            self.delete(url)
+            total -= size
+
+    def _hit(self, url, entry):
+        self.hits += 1
+        metrics.inc("http_cache_total", result="hit")
+        self.touch(url)
+        return CachedResponse(entry["status"], entry["final_url"], self.read_body(url), entry["content_type"],
+                              from_cache=True)
+
+    def _revalidated(self, url, entry, headers):
+        self.revalidated += 1
+        metrics.inc("http_cache_total", result="revalidated")
+        self.refresh(url, headers)
+        return CachedResponse(entry["status"], entry["final_url"], self.read_body(url), entry["content_type"],
+                              dict(headers), from_cache=True)
+
+    async def fetch_cached(self, session, url, headers=None):
+        """The cached response for ``url`` if it is fresh or a 304 confirms it, else None.
+
+        For answering browser navigations: it never downloads a body or
+        follows a redirect, and only serves entries that were not reached
+        through one, so everything else can go to the network from the
+        browser itself (with the right base URL and Set-Cookie handling).
+        """
+        entry = self.lookup(url)
+        if entry is None or entry["final_url"] != url:
+            return None
+        if entry["expires_at"] > time.time():
+            return self._hit(url, entry)
+        if not (entry["etag"] or entry["last_modified"]):
+            return None
+        request_headers = dict(headers or {})
+        if entry["etag"]:
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+        async with session.get(url, headers=request_headers, allow_redirects=False) as response:
+            if response.status == 304:
+                return self._revalidated(url, entry, response.headers)
+        return None
+
+    async def fetch(self, session, url, headers=None):
+        """GET ``url`` through the cache using an aiohttp ``session``."""
+        entry = self.lookup(url)
+        request_headers = dict(headers or {})
+        if entry:
+            if entry["expires_at"] > time.time():
+                return self._hit(url, entry)
+            if entry["etag"]:
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        async with session.get(url, headers=request_headers, allow_redirects=True) as response:
+            if response.status == 304 and entry:
+                return self._revalidated(url, entry, response.headers)
+            body = await response.read()
+            self.misses += 1
+            metrics.inc("http_cache_total", result="miss")
+            if response.status == 200:
+                self.store(url, str(response.url), response.status, response.headers, body)
+            return CachedResponse(response.status, str(response.url), body,
+                                  response.headers.get("Content-Type"), dict(response.headers))
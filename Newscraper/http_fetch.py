@@ -0,0 +1,195 @@
+# http_fetch.py
+import asyncio
+import json
+import logging
+import os
+from urllib.parse import urlsplit
+import aiohttp
+from lxml import etree, html as lxml_html
+from utils import get_user_agent
+from http_cache import HttpCache, replay_headers
+from render_profile import intercept
+
+# Pages smaller than this are almost always a JS shell around an empty root div
+min_body_bytes = 5000
+# Fewer characters than this inside <article> means the content is rendered client-side
+min_article_chars = 200
+
+strategy_file = os.path.join("Saved_Articles", "fetch_strategy.json")
+
+
+def domain_of(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_html(page_content):
+    try:
+        return lxml_html.fromstring(page_content)
+    except (ValueError, etree.ParserError):
+        return None
+
+
+def looks_js_dependent(page_content, size, tree=None):
+    """Return a reason string if the HTML (``size`` bytes as received) needs a real browser, else None."""
+    if size < min_body_bytes:
+        return "body too small"
+    tree = tree if tree is not None else parse_html(page_content)
+    if tree is None:
+        return "unparseable"
+    if not tree.xpath("//h1"):
+        return "missing h1"
+    articles = tree.xpath("//article")
+    if articles and not any(len(a.text_content().strip()) >= min_article_chars for a in articles):
+        return "empty article"
+    return None
+
+
+def extract_title(tree):
+    if tree is None:
+        return "UnknownTitle"
+    h1 = tree.xpath("//h1")
+    return h1[0].text_content().strip() if h1 else "UnknownTitle"
+
+
+class FetchStrategy:
+    """Remembers per domain whether plain HTTP was good enough last time."""
+
+    def __init__(self, path=strategy_file, fallback_threshold=2):
+        self.path = path
+        self.fallback_threshold = fallback_threshold
+        self.domains = {}
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.domains = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Ignoring unreadable fetch strategy file {path}: {e}")
+
+    def use_http(self, url):
+        stats = self.domains.get(domain_of(url))
+        if not stats:
+            return True
+        # Go straight to the browser once a domain keeps needing it more than not
+        return not (stats["browser"] >= self.fallback_threshold and stats["browser"] > stats["http"])
+
+    def record(self, url, used_browser, reason=None):
+        stats = self.domains.setdefault(domain_of(url), {"http": 0, "browser": 0, "reason": None})
+        if used_browser:
+            stats["browser"] += 1
+            stats["reason"] = reason
+        else:
+            stats["http"] += 1
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.domains, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+class HttpFetcher:
+    """Pooled keep-alive HTTP client used before falling back to pyppeteer.
+
+    Every GET goes through a conditional-GET ``HttpCache`` unless ``cache=False``.
+    """
+
+    def __init__(self, strategy=None, cache=None, limit=100, limit_per_host=8, timeout=15):
+        self.strategy = strategy or FetchStrategy()
+        self.cache = HttpCache() if cache is None else cache
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.strategy.save()
+        if self.cache:
+            self.cache.close()
+
+    async def get(self, url, headers=None):
+        await self.start()
+        request_headers = {"User-Agent": get_user_agent()}
+        request_headers.update(headers or {})
+        if self.cache:
+            response = await self.cache.fetch(self.session, url, request_headers)
+            return response.status, response.url, response.text(), len(response.body)
+        async with self.session.get(url, headers=request_headers, allow_redirects=True) as response:
+            size = len(await response.read())
+            body = await response.text(errors="replace")
+            return response.status, str(response.url), body, size
+
+    async def fetch_article(self, url):
+        """Try the fast path. Returns (html, title) or None when the browser is needed."""
+        if not self.strategy.use_http(url):
+            return None
+        try:
+            status, final_url, page_content, size = await self.get(url)
+        except (aiohttp.ClientError, UnicodeDecodeError, asyncio.TimeoutError) as e:
+            self.strategy.record(url, used_browser=True, reason=f"http error: {e.__class__.__name__}")
+            return None
+
+        if status != 200:
+            reason = f"status {status}"
+        else:
+            tree = parse_html(page_content)
+            reason = looks_js_dependent(page_content, size, tree)
+
+        # Record against the publisher we ended up on, not the redirecting link
+        self.strategy.record(final_url, used_browser=reason is not None, reason=reason)
+        if reason:
+            logging.info(f"Falling back to browser for {final_url}: {reason}")
+            return None
+        return page_content, extract_title(tree)
+
+    async def serve_document(self, request):
+        """Answer a browser navigation from the HTTP cache; False lets the browser load it itself.
+
+        Only cached pages are served. Misses, changed pages and redirects go
+        to the network from the browser, which then keeps the page's real
+        URL and the cookies the site sets.
+        """
+        try:
+            response = await self.cache.fetch_cached(self.session, request.url, request.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.debug(f"Cache revalidation failed for {request.url}, letting the browser load it: {e}")
+            return False
+        if response is None:
+            return False
+        headers = {k: v for k, v in response.headers.items() if k.lower() in replay_headers}
+        await request.respond({
+            "status": response.status,
+            "headers": headers,
+            "contentType": response.content_type,
+            "body": response.body,
+        })
+        return True
+
+    async def route_documents(self, page, profile=None, meter=None):
+        """Serve a pyppeteer page's top-level document requests through the HTTP cache."""
+        if self.cache:
+            await self.start()
+        await intercept(page, profile, self.serve_document if self.cache else None, meter)
@@ -0,0 +1,176 @@
+# job_queue.py
+import logging
+import os
+import random
+import sqlite3
+import time
+
+queue_file = os.path.join("Saved_Articles", "jobs.sqlite3")
+
+schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL,
+    max_articles INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS job_articles (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, url)
+);
+"""
+
+
+class JobQueue:
+    """Durable query queue in SQLite (WAL), safe to share between processes.
+
+    Workers lease a job for ``lease_seconds``; a crashed worker's lease
+    expires and counts as a failed attempt. Failed jobs go back to pending
+    with exponential backoff until ``max_attempts`` is reached.
+    """
+
+    def __init__(self, path=queue_file, lease_seconds=600, max_attempts=5, backoff_base=30, backoff_cap=3600):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit mode so BEGIN IMMEDIATE below controls the write transactions
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(schema)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, query, max_articles=10):
+        """Add a query unless the same one is already waiting or running; returns the job id."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT id FROM jobs WHERE query = ? AND status IN ('pending', 'leased')",
+                                    (query,)).fetchone()
+            if row:
+                job_id = row[0]
+            else:
+                job_id = self.conn.execute(
+                    "INSERT INTO jobs (query, max_articles, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (query, max_articles, now, now)).lastrowid
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def lease(self, worker):
+        """Claim the next runnable job. Returns a dict or None.
+
+        Jobs whose lease expired first go through fail(), so a job that keeps
+        crashing or hanging its worker backs off and is eventually given up on.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = self.conn.execute("SELECT id, worker FROM jobs WHERE status = 'leased' AND lease_until < ?",
+                                        (now,)).fetchall()
+            for job_id, owner in expired:
+                self._fail(job_id, owner, "lease expired (worker crashed or hung)")
+            row = self.conn.execute(
+                "SELECT id, query, max_articles, attempts FROM jobs"
+                " WHERE status = 'pending' AND next_attempt_at <= ?"
+                " ORDER BY next_attempt_at, id LIMIT 1", (now,)).fetchone()
+            if row:
+                self.conn.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, updated_at = ?"
+                                  " WHERE id = ?", (worker, now + self.lease_seconds, now, row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return {"id": row[0], "query": row[1], "max_articles": row[2], "attempts": row[3]}
+
+    def heartbeat(self, job_id, worker):
+        self.conn.execute("UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                          (time.time() + self.lease_seconds, time.time(), job_id, worker))
+
+    def complete(self, job_id, worker):
+        """Mark a job done; False if ``worker`` no longer holds its lease (it expired and was retried)."""
+        updated = self.conn.execute("UPDATE jobs SET status = 'done', lease_until = NULL, last_error = NULL,"
+                                    " updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                                    (time.time(), job_id, worker)).rowcount
+        if not updated:
+            logging.warning(f"Job {job_id} is no longer leased to {worker}; not marking it done")
+        return bool(updated)
+
+    def fail(self, job_id, worker, error):
+        """Record a failed attempt; False if ``worker`` no longer holds the job's lease."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = self._fail(job_id, worker, error)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return failed
+
+    def _fail(self, job_id, worker, error):
+        # Runs inside the caller's write transaction, so the attempts read and the update can't interleave
+        now = time.time()
+        row = self.conn.execute("SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND status = 'leased'",
+                                (job_id, worker)).fetchone()
+        if row is None:
+            logging.warning(f"Job {job_id} is no longer leased to {worker}; ignoring its failure: {error}")
+            return False
+        attempts = row[0] + 1
+        if attempts >= self.max_attempts:
+            status, next_attempt = "failed", now
+            logging.error(f"Job {job_id} failed permanently after {attempts} attempts: {error}")
+        else:
+            # Exponential backoff with jitter so retries from many workers don't line up
+            delay = min(self.backoff_cap, self.backoff_base * 2 ** (attempts - 1))
+            status, next_attempt = "pending", now + delay * random.uniform(0.5, 1.5)
+            logging.warning(f"Job {job_id} failed (attempt {attempts}), retrying in {next_attempt - now:.0f}s: {error}")
+        self.conn.execute("UPDATE jobs SET status = ?, attempts = ?, next_attempt_at = ?, lease_until = NULL,"
+                          " last_error = ?, updated_at = ? WHERE id = ?",
+                          (status, attempts, next_attempt, str(error)[:500], now, job_id))
+        return True
+
+    def pending_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def next_wakeup(self):
+        row = self.conn.execute("SELECT MIN(next_attempt_at) FROM jobs WHERE status = 'pending'").fetchone()
+        return row[0]
+
+    def summary(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class JobCheckpoint:
+    """Per-article progress for one job, so a restarted job skips what it already finished."""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def done(self, url):
+        row = self.queue.conn.execute("SELECT 1 FROM job_articles WHERE job_id = ? AND url = ? AND status = 'done'",
+                                      (self.job_id, url)).fetchone()
+        return row is not None
+
+    def mark(self, url, ok):
+        self.queue.conn.execute("INSERT OR REPLACE INTO job_articles (job_id, url, status, updated_at)"
+                                " VALUES (?, ?, ?, ?)", (self.job_id, url, "done" if ok else "failed", time.time()))
@@ -0,0 +1,140 @@
+# link_resolver.py
+import asyncio
+import base64
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime
+from urllib.parse import urljoin, urlsplit
+import aiohttp
+from lxml import etree, html as lxml_html
+from utils import get_user_agent
+
+redirects_file = os.path.join("Saved_Articles", "redirects.sqlite3")
+
+# One evaluate call for every result instead of one round-trip per <article>
+collect_links_js = """() => Array.from(document.querySelectorAll('article')).map(article => {
+    const anchor = article.querySelector('a');
+    const time = article.querySelector('time[datetime]');
+    return {url: anchor ? anchor.href : null, published: time ? time.getAttribute('datetime') : null};
+})"""
+
+google_article_re = re.compile(r"/articles/([A-Za-z0-9_-]+)")
+embedded_url_re = re.compile(rb"https?://[\x21-\x7e]+")
+
+schema = """
+CREATE TABLE IF NOT EXISTS redirects (
+    url TEXT PRIMARY KEY,
+    canonical TEXT NOT NULL,
+    resolved_at TEXT NOT NULL
+);
+"""
+
+
+# Hosts whose links are redirects to be resolved; the benchmark adds its stand-in
+redirect_hosts = ("news.google.com",)
+
+
+def is_google_news(url):
+    return (urlsplit(url).hostname or "").endswith(redirect_hosts)
+
+
+def decode_google_news_id(url):
+    """Older Google News article ids are base64 protobufs that embed the publisher URL."""
+    match = google_article_re.search(url)
+    if not match:
+        return None
+    article_id = match.group(1)
+    try:
+        raw = base64.urlsafe_b64decode(article_id + "=" * (-len(article_id) % 4))
+    except (ValueError, TypeError):
+        return None
+    embedded = embedded_url_re.search(raw)
+    return embedded.group(0).decode("ascii") if embedded else None
+
+
+def url_from_interstitial(page_content, base_url):
+    # Google's redirect pages carry the target in a data attribute, a meta refresh or a lone link
+    try:
+        tree = lxml_html.fromstring(page_content)
+    except (ValueError, etree.ParserError):
+        return None
+    for value in tree.xpath("//@data-n-au | //@data-url"):
+        if value.startswith("http"):
+            return value
+    for content in tree.xpath('//meta[translate(@http-equiv, "REFRESH", "refresh")="refresh"]/@content'):
+        start = content.lower().find("url=")
+        if start != -1:
+            return urljoin(base_url, content[start + 4:].strip("'\" "))
+    links = [href for href in tree.xpath("//a/@href") if href.startswith("http") and not is_google_news(href)]
+    return links[0] if len(links) == 1 else None
+
+
+class LinkResolver:
+    """Turns news.google.com redirect links into publisher URLs, remembering every answer."""
+
+    def __init__(self, path=redirects_file, concurrency=16, timeout=10):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(schema)
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    def close(self):
+        self.conn.close()
+
+    def cached(self, url):
+        row = self.conn.execute("SELECT canonical FROM redirects WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def remember(self, url, canonical):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO redirects (url, canonical, resolved_at) VALUES (?, ?, ?)",
+                              (url, canonical, datetime.now().isoformat(timespec="seconds")))
+
+    async def _resolve(self, session, url):
+        embedded = decode_google_news_id(url)
+        if embedded:
+            return embedded
+        headers = {"User-Agent": get_user_agent()}
+        # HEAD is enough when the hop is a plain HTTP redirect
+        try:
+            async with session.head(url, headers=headers, allow_redirects=True, timeout=self.timeout) as response:
+                final_url = str(response.url)
+                if response.status < 400 and not is_google_news(final_url):
+                    return final_url
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.debug(f"HEAD failed for {url}: {e}")
+        async with session.get(url, headers=headers, allow_redirects=True, timeout=self.timeout) as response:
+            final_url = str(response.url)
+            if not is_google_news(final_url):
+                return final_url
+            return url_from_interstitial(await response.text(errors="replace"), final_url)
+
+    async def resolve_all(self, session, links):
+        """Resolve ``links`` concurrently; unresolvable links are returned unchanged for the browser."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def resolve_one(url):
+            if not url or not is_google_news(url):
+                return url
+            canonical = self.cached(url)
+            if canonical:
+                return canonical
+            async with semaphore:
+                try:
+                    canonical = await self._resolve(session, url)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logging.debug(f"Could not resolve {url}: {e}")
+                    canonical = None
+            if canonical:
+                self.remember(url, canonical)
+                return canonical
+            return url
+
+        resolved = await asyncio.gather(*(resolve_one(link) for link in links))
+        hits = sum(1 for before, after in zip(links, resolved) if before != after)
+        logging.info(f"Resolved {hits} of {len(links)} links to publisher URLs")
+        return resolved
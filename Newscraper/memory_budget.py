@@ -0,0 +1,98 @@
+# memory_budget.py
+import asyncio
+from metrics import metrics
+
+default_budget_bytes = 64 * 1024 * 1024
+
+
+class Reservation:
+    """Bytes held by one capture; grown to the real page size once it is known."""
+
+    def __init__(self, budget, size=None):
+        self.budget = budget
+        self.requested = size
+        self.size = 0
+
+    async def __aenter__(self):
+        if self.budget:
+            self.size = await self.budget._acquire(self.requested)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.release()
+
+    async def resize(self, size):
+        if not self.budget:
+            return
+        # The page is already in memory by now, so this only corrects the books and never waits
+        self.budget.learn(size)
+        delta, self.size = size - self.size, size
+        await self.budget._give_back(-delta)
+
+    async def release(self):
+        if self.size:
+            size, self.size = self.size, 0
+            await self.budget._give_back(size)
+
+
+def reserve(budget, size=None):
+    """``budget.reserve(size)`` that also accepts ``budget=None`` and then never waits."""
+    return Reservation(budget, size)
+
+
+class ByteBudget:
+    """A global cap on page bytes held in memory by captures in flight.
+
+    A capture reserves an estimate (the running average page size) before
+    it fetches and resizes to the real size afterwards; new captures wait
+    until there is room, and PoliteScheduler waits for room before it hands
+    out the next job, so memory stays flat however many links a query has.
+    One page larger than the whole budget is still let through on its own.
+    """
+
+    def __init__(self, max_bytes=default_budget_bytes, initial_estimate=512 * 1024):
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.estimate = initial_estimate
+        self._cond = None
+
+    @property
+    def cond(self):
+        # Created lazily so the budget can be built outside a running event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def learn(self, size):
+        self.estimate = int(0.8 * self.estimate + 0.2 * size)
+
+    def _account(self, delta):
+        self.in_use += delta
+        self.peak = max(self.peak, self.in_use)
+        metrics.add("budget_bytes_in_use", delta)
+
+    def _fits(self, size):
+        return self.in_use == 0 or self.in_use + size <= self.max_bytes
+
+    def reserve(self, size=None):
+        """``async with budget.reserve() as held:`` waits for room, then ``await held.resize(n)`` once the size is known."""
+        return Reservation(self, size)
+
+    async def _acquire(self, size):
+        size = min(self.estimate if size is None else size, self.max_bytes)
+        async with self.cond:
+            if not self._fits(size):
+                metrics.inc("budget_waits_total")
+                await self.cond.wait_for(lambda: self._fits(size))
+            self._account(size)
+        return size
+
+    async def wait_for_room(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self._fits(self.estimate))
+
+    async def _give_back(self, size):
+        async with self.cond:
+            self._account(-size)
+            self.cond.notify_all()
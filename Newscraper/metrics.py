@@ -0,0 +1,195 @@
+# metrics.py
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+metrics_file = os.path.join("Saved_Articles", "metrics.prom")
+
+# Seconds; wide enough for a 5 ms cache hit and a 60 s navigation timeout
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is one bisect and two additions."""
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, which is what Prometheus would estimate too
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """In-process counters, gauges and stage latency histograms for one scraper process.
+
+    Everything is updated from the event loop thread, so there is no locking.
+    ``render()`` produces the Prometheus text format, which ``write()`` puts in
+    a file for node_exporter's textfile collector and ``serve()`` exposes over HTTP.
+    """
+
+    def __init__(self, prefix="newscraper", path=metrics_file):
+        self.prefix = prefix
+        # Where write() goes by default; None turns it off (crawl workers leave it to the coordinator)
+        self.path = path
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = defaultdict(float)
+        self.gauges = defaultdict(float)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def stage(self, stage):
+        """Time a pipeline stage (discover, resolve, navigate, content, store, ...)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - started, stage=stage)
+
+    def inc(self, name, amount=1, **labels):
+        self.counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def add(self, name, amount, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] += amount
+
+    def render(self):
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            full_name = f"{self.prefix}_{name}"
+            header(full_name, "counter")
+            lines.append(f"{full_name}{format_labels(labels)} {value:g}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            full_name = f"{self.prefix}_{name}"
+            header(full_name, "gauge")
+            lines.append(f"{full_name}{format_labels(labels)} {value:g}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            full_name = f"{self.prefix}_{name}"
+            header(full_name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{full_name}_bucket{format_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{full_name}_bucket{format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{full_name}_sum{format_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{full_name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Written whole and renamed so a scraping collector never reads half a file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def snapshot(self):
+        """Picklable copy of every value, for sending to another process."""
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "histograms": {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in self.histograms.items()},
+        }
+
+    def merge(self, snapshots):
+        """Replace this registry's values with the sum of ``snapshots`` (one per process)."""
+        self.histograms = {}
+        self.counters = defaultdict(float)
+        self.gauges = defaultdict(float)
+        for snapshot in snapshots:
+            for key, value in snapshot["counters"].items():
+                self.counters[key] += value
+            for key, value in snapshot["gauges"].items():
+                self.gauges[key] += value
+            for key, (buckets, counts, total, count) in snapshot["histograms"].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    async def serve(self, port, host="127.0.0.1"):
+        """Expose /metrics over HTTP; returns the aiohttp runner so the caller can clean it up."""
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return runner
+
+    def summary(self):
+        """Human-readable run summary: stage latencies, outcome counters and throughput."""
+        lines = []
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if not histogram.count:
+                continue
+            label = ",".join(str(v) for _, v in labels) or name
+            lines.append(f"{label}: {histogram.count} in {histogram.sum:.1f}s, mean {histogram.sum / histogram.count:.3f}s,"
+                         f" p50 <= {histogram.quantile(0.5):g}s, p95 <= {histogram.quantile(0.95):g}s")
+        for (name, labels), value in sorted(self.counters.items()):
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            lines.append(f"{name}{'{' + label + '}' if label else ''}: {value:g}")
+        elapsed = time.time() - self.started
+        saved = sum(value for (name, labels), value in self.counters.items()
+                    if name == "articles_total" and ("outcome", "saved") in labels)
+        lines.append(f"throughput: {saved / elapsed if elapsed else 0:.2f} articles/s over {elapsed:.0f}s")
+        for line in lines:
+            logging.info(f"Metrics {line}")
+        return lines
+
+
+# Shared by every module in the process, like the logging root logger
+metrics = Metrics()
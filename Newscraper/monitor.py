@@ -0,0 +1,69 @@
+# monitor.py
+import argparse
+import asyncio
+import logging
+import time
+from batch import read_queries
+from scraper import scrape_articles, scrape_proxies_from_url, proxy_list_url
+from watermark import WatermarkStore, watermark_file
+from metrics import metrics
+
+
+def parse_interval(value):
+    # "90", "90s", "30m", "6h" -> seconds
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+async def refresh(queries, store, proxies, max_articles):
+    for query in queries:
+        started = time.monotonic()
+        try:
+            summary = await scrape_articles(query, max_articles, proxies, watermarks=store)
+        except Exception as e:
+            logging.error(f"Refresh of '{query}' failed: {e}")
+            continue
+        logging.info(f"Refreshed '{query}' in {time.monotonic() - started:.1f}s: {summary}")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Re-run Google News queries and fetch only what is new since the last run")
+    parser.add_argument("queries", nargs="*", help="Queries to monitor")
+    parser.add_argument("--file", help="File with one query per line, or '-' for stdin")
+    parser.add_argument("--every", type=parse_interval, default=None,
+                        help="Refresh interval such as 30m or 6h; without it every query is refreshed once")
+    parser.add_argument("--max-articles", type=int, default=50, help="Upper bound on new articles per refresh")
+    parser.add_argument("--watermarks", default=watermark_file, help="SQLite watermark store path")
+    parser.add_argument("--use-proxies", action="store_true", help="Load the public proxy list like the CLI does")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while running")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_arguments()
+    queries = list(args.queries)
+    if args.file:
+        queries.extend(read_queries(args.file))
+    if not queries:
+        logging.error("No queries given")
+        return
+    proxies = scrape_proxies_from_url(proxy_list_url) if args.use_proxies else []
+    store = WatermarkStore(args.watermarks)
+    runner = await metrics.serve(args.metrics_port) if args.metrics_port else None
+    try:
+        while True:
+            started = time.monotonic()
+            await refresh(queries, store, proxies, args.max_articles)
+            if args.every is None:
+                break
+            await asyncio.sleep(max(0.0, args.every - (time.monotonic() - started)))
+    finally:
+        store.close()
+        if runner:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
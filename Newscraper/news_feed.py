@@ -0,0 +1,62 @@
+# news_feed.py
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote_plus
+from lxml import etree
+from utils import get_user_agent
+
+# The same results as news.google.com/search, as RSS: link, title, source and pubDate per <item>
+news_feed_url = "https://news.google.com/rss/search?q={query}&hl=en-US&gl=US&ceid=US:en"
+
+def item_from_element(element):
+    def text(tag):
+        child = element.find(tag)
+        return child.text.strip() if child is not None and child.text else None
+
+    published = None
+    raw_date = text("pubDate")
+    if raw_date:
+        try:
+            published = parsedate_to_datetime(raw_date).isoformat()
+        except (TypeError, ValueError):
+            pass
+    source = element.find("source")
+    return {
+        "url": text("link"),
+        "title": text("title"),
+        "published": published,
+        "source": source.text if source is not None else None,
+        "source_url": source.get("url") if source is not None else None,
+    }
+
+
+async def fetch_feed_items(session, query, limit=None, feed_url=news_feed_url, accept=None):
+    """Fetch a Google News search feed with an aiohttp ``session``, parsing items as the bytes arrive.
+
+    Stops reading as soon as ``limit`` items are in, counting only items
+    ``accept(item)`` is true for when given (e.g. ones not seen before).
+    Returns (items, stopped_early), where stopped_early means the rest of
+    the feed was left unread and may hold more such items. Raises aiohttp errors and lxml's XMLSyntaxError so the caller can fall
+    back to the browser.
+    """
+    accepted = 0
+    parser = etree.XMLPullParser(events=("end",), tag="item", resolve_entities=False, no_network=True)
+    items = []
+    url = feed_url.format(query=quote_plus(query))
+    async with session.get(url, headers={"User-Agent": get_user_agent()}) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(16 * 1024):
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                item = item_from_element(element)
+                # Drop parsed items so the tree never holds more than the one being read
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+                if item["url"]:
+                    items.append(item)
+                    if accept is None or accept(item):
+                        accepted += 1
+                if limit and accepted >= limit:
+                    return items, True
+    parser.close()
+    return items, False
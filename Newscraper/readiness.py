@@ -0,0 +1,133 @@
+# readiness.py
+import asyncio
+import json
+import logging
+import os
+import time
+from pyppeteer.errors import TimeoutError as PageTimeoutError
+from http_fetch import domain_of
+from metrics import metrics
+
+readiness_file = os.path.join("Saved_Articles", "readiness.json")
+
+# Any of these means the article body has been rendered
+content_selector = "article, main, h1, [role=main]"
+
+
+class NetworkQuiet:
+    """Tracks in-flight requests on a page so we can wait for the network to settle."""
+
+    def __init__(self, page, max_inflight=2):
+        self.page = page
+        # Long-polling and analytics beacons may never finish, so allow a couple to stay open
+        self.max_inflight = max_inflight
+        self.inflight = set()
+        self.last_change = time.monotonic()
+        self._handlers = {
+            "request": self._on_start,
+            "requestfinished": self._on_done,
+            "requestfailed": self._on_done,
+        }
+        for event, handler in self._handlers.items():
+            page.on(event, handler)
+
+    def _on_start(self, request):
+        self.inflight.add(id(request))
+        self.last_change = time.monotonic()
+
+    def _on_done(self, request):
+        self.inflight.discard(id(request))
+        self.last_change = time.monotonic()
+
+    async def wait(self, window, deadline):
+        while time.monotonic() < deadline:
+            if len(self.inflight) <= self.max_inflight and time.monotonic() - self.last_change >= window:
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    def detach(self):
+        # Pooled pages are reused, so don't leave listeners behind
+        for event, handler in self._handlers.items():
+            self.page.remove_listener(event, handler)
+
+
+class ReadinessEngine:
+    """Replaces a fixed sleep after page.goto with waits on real readiness signals.
+
+    A page counts as ready after DOMContentLoaded, once an article/main/h1
+    element exists and the network has been quiet for ``quiet_window``
+    seconds. How long that took is learned per domain, and the next wait on
+    that domain times out at a multiple of the learned time instead of a
+    global constant.
+    """
+
+    def __init__(self, path=readiness_file, quiet_window=0.5, default_timeout=10.0, min_timeout=2.0,
+                 max_timeout=30.0, navigation_timeout=30.0):
+        self.path = path
+        self.quiet_window = quiet_window
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.navigation_timeout = navigation_timeout
+        self.domains = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.domains = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Ignoring unreadable readiness file {path}: {e}")
+
+    def timeout_for(self, domain):
+        stats = self.domains.get(domain)
+        if not stats or stats["samples"] < 3:
+            return self.default_timeout
+        return min(self.max_timeout, max(self.min_timeout, 3 * stats["ready"] + 1))
+
+    def learn(self, domain, seconds, complete):
+        stats = self.domains.setdefault(domain, {"samples": 0, "ready": seconds, "incomplete": 0})
+        stats["samples"] += 1
+        if not complete:
+            stats["incomplete"] += 1
+        # Exponentially weighted so the estimate follows a site that gets faster or slower
+        stats["ready"] = round(0.7 * stats["ready"] + 0.3 * seconds, 3)
+
+    async def goto(self, page, url, options=None):
+        """Navigate and wait until ready; returns True if every signal fired before the timeout."""
+        domain = domain_of(url)
+        timeout = self.timeout_for(domain)
+        quiet = NetworkQuiet(page)
+        started = time.monotonic()
+        try:
+            goto_options = {"waitUntil": "domcontentloaded", "timeout": int(self.navigation_timeout * 1000)}
+            goto_options.update(options or {})
+            with metrics.stage("navigate"):
+                await page.goto(url, goto_options)
+            deadline = time.monotonic() + timeout
+
+            with metrics.stage("ready_wait"):
+                try:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    await page.waitForSelector(content_selector, {"timeout": int(remaining * 1000)})
+                    has_content = True
+                except PageTimeoutError:
+                    has_content = False
+                settled = await quiet.wait(self.quiet_window, deadline)
+        finally:
+            quiet.detach()
+
+        elapsed = time.monotonic() - started
+        complete = has_content and settled
+        self.learn(domain, elapsed, complete)
+        if not complete:
+            metrics.inc("readiness_timeouts_total", reason="no_content" if not has_content else "network_busy")
+            missing = "no article/main/h1" if not has_content else "network still busy"
+            logging.info(f"Capturing {url} after {elapsed:.1f}s timeout ({missing})")
+        return complete
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.domains, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
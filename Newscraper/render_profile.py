@@ -0,0 +1,161 @@
+# render_profile.py
+import asyncio
+import json
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+
+stats_file = os.path.join("Saved_Articles", "render_stats.json")
+
+# Analytics, ad and tracking hosts that never contribute article text
+blocked_domains = {
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "googletagservices.com", "adservice.google.com", "facebook.net",
+    "connect.facebook.net", "scorecardresearch.com", "taboola.com", "outbrain.com", "chartbeat.com",
+    "chartbeat.net", "amazon-adsystem.com", "adnxs.com", "criteo.com", "criteo.net", "hotjar.com",
+    "quantserve.com", "moatads.com", "pubmatic.com", "rubiconproject.com", "casalemedia.com",
+    "openx.net", "segment.io", "segment.com", "nr-data.net", "optimizely.com", "krxd.net",
+    "bluekai.com", "demdex.net", "omtrdc.net", "everesttech.net", "adsrvr.org", "teads.tv",
+    "permutive.com", "cookielaw.org", "onetrust.com", "tiqcdn.com", "parsely.com", "newrelic.com",
+}
+
+
+class RenderProfile:
+    """What a capture page is allowed to load.
+
+    ``blocked_types`` are pyppeteer resource types (image, media, font,
+    stylesheet, script, xhr, fetch, websocket, manifest, other).
+    """
+
+    def __init__(self, name, blocked_types=(), block_domains=False, javascript=True):
+        self.name = name
+        self.blocked_types = set(blocked_types)
+        self.block_domains = block_domains
+        self.javascript = javascript
+
+    def blocks(self, request):
+        if request.isNavigationRequest():
+            return False
+        if request.resourceType in self.blocked_types:
+            return True
+        if self.block_domains:
+            host = urlsplit(request.url).hostname or ""
+            parts = host.split(".")
+            return any(".".join(parts[i:]) in blocked_domains for i in range(len(parts) - 1))
+        return False
+
+    @property
+    def intercepts(self):
+        return bool(self.blocked_types or self.block_domains)
+
+
+profiles = {
+    # Everything a normal browser would load
+    "full": RenderProfile("full"),
+    # Enough to let client-side rendering produce the article text
+    "text": RenderProfile("text", {"image", "media", "font", "stylesheet", "manifest", "texttrack", "eventsource",
+                                   "websocket"}, block_domains=True),
+    # Server-rendered HTML only
+    "static": RenderProfile("static", {"image", "media", "font", "stylesheet", "manifest", "texttrack", "eventsource",
+                                       "websocket", "script", "xhr", "fetch", "other"}, block_domains=True,
+                            javascript=False),
+}
+
+
+async def intercept(page, profile=None, document_handler=None, meter=None):
+    """Install one request handler that applies ``profile`` and optionally serves documents.
+
+    ``document_handler(request)`` is awaited for top-level GET navigations and
+    returns True if it answered the request itself. Blocked requests are
+    counted on ``meter`` when one is given.
+    """
+    if profile and not profile.javascript:
+        await page.setJavaScriptEnabled(False)
+    if not ((profile and profile.intercepts) or document_handler):
+        return
+
+    async def handle(request):
+        try:
+            if profile and profile.blocks(request):
+                if meter:
+                    meter.blocked += 1
+                await request.abort()
+                return
+            if document_handler and request.isNavigationRequest() and request.method == "GET":
+                if await document_handler(request):
+                    return
+            await request.continue_()
+        except Exception as e:
+            # The page may have navigated away or closed while we were deciding
+            logging.debug(f"Request interception failed for {request.url}: {e}")
+
+    await page.setRequestInterception(True)
+    page.on("request", lambda request: asyncio.ensure_future(handle(request)))
+
+
+class RenderMeter:
+    """Counts bytes actually transferred and requests blocked for one page capture."""
+
+    def __init__(self, page):
+        self.bytes = 0
+        self.blocked = 0
+        self.started = time.monotonic()
+        self.seconds = None
+        self._client = page._client
+        self._client.on("Network.loadingFinished", self._on_finished)
+
+    def _on_finished(self, event):
+        self.bytes += int(event.get("encodedDataLength", 0))
+
+    def stop(self):
+        self.seconds = time.monotonic() - self.started
+        # Pooled pages outlive the capture; stop counting the next lease's traffic here
+        self._client.remove_listener("Network.loadingFinished", self._on_finished)
+        return self
+
+
+class RenderStats:
+    """Per-profile totals across runs, used to report savings against the full profile."""
+
+    def __init__(self, path=stats_file):
+        self.path = path
+        self.profiles = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.profiles = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Ignoring unreadable render stats {path}: {e}")
+
+    def record(self, profile, meter):
+        stats = self.profiles.setdefault(profile.name, {"pages": 0, "bytes": 0, "seconds": 0.0, "blocked": 0})
+        stats["pages"] += 1
+        stats["bytes"] += meter.bytes
+        stats["seconds"] += meter.seconds or 0.0
+        stats["blocked"] += meter.blocked
+
+    def report(self):
+        baseline = self.profiles.get("full")
+        lines = []
+        for name, stats in sorted(self.profiles.items()):
+            if not stats["pages"]:
+                continue
+            avg_kb = stats["bytes"] / stats["pages"] / 1024
+            avg_s = stats["seconds"] / stats["pages"]
+            line = f"{name}: {stats['pages']} pages, {avg_kb:.0f} KB and {avg_s:.2f}s per page, {stats['blocked']} requests blocked"
+            if baseline and baseline["pages"] and name != "full":
+                base_kb = baseline["bytes"] / baseline["pages"] / 1024
+                base_s = baseline["seconds"] / baseline["pages"]
+                line += f" (saves {base_kb - avg_kb:.0f} KB and {base_s - avg_s:.2f}s per page vs full)"
+            lines.append(line)
+        for line in lines:
+            logging.info(f"Render profile {line}")
+        return lines
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.profiles, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,170 @@
+# scheduler.py
+import asyncio
+import logging
+import time
+from collections import deque
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import aiohttp
+
+# robots.txt rules are reused across queries in the same process for an hour
+robots_ttl = 3600
+_robots_cache = {}
+
+
+def host_of(url):
+    # Keep the port so local test servers on different ports get separate queues
+    return urlsplit(url).netloc.lower()
+
+
+class HostQueue:
+    def __init__(self, host, scheme, limit, delay):
+        self.host = host
+        self.scheme = scheme
+        self.limit = limit
+        self.delay = delay
+        self.pending = deque()
+        self.active = 0
+        self.next_allowed = 0.0
+        self.robots = None
+
+
+class PoliteScheduler:
+    """Runs jobs under a global concurrency cap with per-host limits.
+
+    Hosts are served round-robin, each with its own queue, concurrency
+    limit and minimum spacing between requests (raised to the host's
+    robots.txt Crawl-delay when it has one). With a ``budget`` (a
+    memory_budget.ByteBudget) no new job is started while the page bytes
+    already in flight fill it.
+
+        scheduler = PoliteScheduler(concurrency=8, per_host=2)
+        for link in links:
+            scheduler.submit(link, lambda link=link: fetch(link))
+        results = await scheduler.run()
+    """
+
+    def __init__(self, concurrency=8, per_host=2, min_delay=0.0, user_agent="*",
+                 respect_robots=True, skip_disallowed=False, robots_timeout=5, budget=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.min_delay = min_delay
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self.skip_disallowed = skip_disallowed
+        self.robots_timeout = robots_timeout
+        self.budget = budget
+        self.hosts = {}
+        self.ring = deque()
+        self.jobs = []
+        self._cond = None
+
+    def submit(self, url, job_factory):
+        """Queue ``job_factory()`` (a coroutine factory) for ``url``; returns its result index."""
+        host = host_of(url)
+        queue = self.hosts.get(host)
+        if queue is None:
+            queue = self.hosts[host] = HostQueue(host, urlsplit(url).scheme or "https", self.per_host, self.min_delay)
+            self.ring.append(host)
+        index = len(self.jobs)
+        self.jobs.append(url)
+        queue.pending.append((index, url, job_factory))
+        return index
+
+    async def _load_robots(self, session, queue):
+        cached = _robots_cache.get(queue.host)
+        if cached and time.monotonic() - cached[0] < robots_ttl:
+            queue.robots = cached[1]
+        else:
+            parser = RobotFileParser()
+            try:
+                async with session.get(f"{queue.scheme}://{queue.host}/robots.txt") as response:
+                    if response.status == 200:
+                        parser.parse((await response.text(errors="replace")).splitlines())
+                    else:
+                        # Missing robots.txt means everything is allowed
+                        parser.parse([])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.debug(f"Could not fetch robots.txt for {queue.host}: {e}")
+                parser.parse([])
+            _robots_cache[queue.host] = (time.monotonic(), parser)
+            queue.robots = parser
+
+        crawl_delay = queue.robots.crawl_delay(self.user_agent)
+        if crawl_delay:
+            queue.delay = max(queue.delay, float(crawl_delay))
+            # A crawl delay only makes sense with one request at a time
+            queue.limit = 1
+            logging.info(f"Honouring Crawl-delay of {queue.delay}s for {queue.host}")
+
+    async def _prepare(self):
+        if not self.respect_robots:
+            return
+        timeout = aiohttp.ClientTimeout(total=self.robots_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            await asyncio.gather(*(self._load_robots(session, q) for q in self.hosts.values()))
+
+    def _allowed(self, queue, url):
+        if not self.skip_disallowed or queue.robots is None:
+            return True
+        return queue.robots.can_fetch(self.user_agent, url)
+
+    async def _next_job(self):
+        loop = asyncio.get_running_loop()
+        async with self._cond:
+            while True:
+                if not any(q.pending for q in self.hosts.values()):
+                    return None
+                now = loop.time()
+                wake_at = None
+                for _ in range(len(self.ring)):
+                    queue = self.hosts[self.ring[0]]
+                    self.ring.rotate(-1)
+                    if not queue.pending or queue.active >= queue.limit:
+                        continue
+                    if queue.next_allowed > now:
+                        wake_at = queue.next_allowed if wake_at is None else min(wake_at, queue.next_allowed)
+                        continue
+                    queue.active += 1
+                    # Reserve the next slot now so parallel workers on this host stay spaced out
+                    queue.next_allowed = now + queue.delay
+                    return queue, queue.pending.popleft()
+                # Nothing runnable: wait for a host slot to free up or a crawl delay to expire
+                try:
+                    await asyncio.wait_for(self._cond.wait(), None if wake_at is None else wake_at - now)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, queue):
+        async with self._cond:
+            queue.active -= 1
+            self._cond.notify_all()
+
+    async def _worker(self, results):
+        while True:
+            if self.budget:
+                # Backpressure: hold off on new pages until captures in flight have written theirs out
+                await self.budget.wait_for_room()
+            job = await self._next_job()
+            if job is None:
+                return
+            queue, (index, url, job_factory) = job
+            try:
+                if self._allowed(queue, url):
+                    results[index] = await job_factory()
+                else:
+                    logging.info(f"Skipping {url}: disallowed by robots.txt")
+            except Exception as e:
+                logging.error(f"Job for {url} failed: {e}")
+                results[index] = e
+            finally:
+                await self._release(queue)
+
+    async def run(self):
+        """Run every submitted job; results (or exceptions) come back in submit order."""
+        self._cond = asyncio.Condition()
+        await self._prepare()
+        results = [None] * len(self.jobs)
+        workers = min(self.concurrency, len(self.jobs))
+        await asyncio.gather(*(self._worker(results) for _ in range(workers)))
+        return results
@@ -1,12 +1,26 @@
 import asyncio
-from pyppeteer import launch
 from datetime import datetime
 import os
 import logging
-from fake_useragent import UserAgent
 from urllib.parse import quote_plus
 import requests
 import random
+import aiohttp
+from lxml import etree
+from http_fetch import HttpFetcher
+from scheduler import PoliteScheduler
+from dedup_index import DedupIndex, content_hash
+from extract import ExtractionPool, append_record
+from archive import ShardedArchive
+from search_index import SearchIndex
+from link_resolver import LinkResolver, collect_links_js
+from browser_pool import BrowserPool
+from news_feed import fetch_feed_items, news_feed_url
+from render_profile import RenderMeter, RenderStats, intercept, profiles
+from readiness import ReadinessEngine
+from metrics import metrics
+from memory_budget import ByteBudget, default_budget_bytes, reserve
+from utils import get_user_agent, iter_chunks
 
 # Setting up basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,6 +28,9 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 output_directory = "Saved_Articles"
 os.makedirs(output_directory, exist_ok=True)
 
+# Google News search results; the benchmark passes a local stand-in instead
+news_search_url = "https://news.google.com/search?q={query}&hl=en-US&gl=US&ceid=US:en&p={page}"
+
 # Proxy list URL
 proxy_list_url = "https://raw.githubusercontent.com/Bob-Bragg/Tools/main/httpproxies28.txt"
 
@@ -27,79 +44,318 @@ def scrape_proxies_from_url(url):
         logging.error(f"Error scraping proxies: {e}")
         return []
 
-async def scrape_and_save_article(browser, link, idx, search_query, proxies, max_retries=3):
+def save_article(link, idx, search_query, page_content, article_title, index=None, archive=None):
+    valid_title = ''.join(char for char in article_title if char.isalnum() or char.isspace())
+    digest = content_hash(page_content)
+
+    if index:
+        existing = index.body_path(digest)
+        if existing:
+            # Same body already stored from another link or query; only add references
+            index.record(link, search_query, digest, existing, len(page_content), article_title, page_content)
+            logging.info(f"Article {idx + 1} is identical to {existing}, not stored again")
+            return existing, False
+
+    if archive:
+        # Append to the current compressed shard instead of creating another loose file
+        file_name = archive.put(link, page_content, digest, query=search_query, title=article_title)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        file_name = os.path.join(output_directory, f"{timestamp}_{search_query}_{valid_title}_{idx + 1}.html")
+
+        with open(file_name, "w", encoding="utf-8") as file:
+            file.write(f"<a href='{link}' target='_blank'>Source Article</a>\n\n")
+            # Slices, so the encoder never builds a second full-size copy of the page
+            for chunk in iter_chunks(page_content):
+                file.write(chunk)
+        metrics.inc("bytes_written_total", os.path.getsize(file_name), storage="files")
+
+    if index:
+        index.record(link, search_query, digest, file_name, len(page_content), article_title, page_content)
+    logging.info(f"Article {idx + 1} saved: {file_name}")
+    return file_name, True
+
+async def store_article(link, idx, search_query, page_content, article_title, index=None, extractor=None, archive=None,
+                        search=None, record_sink=None):
+    with metrics.stage("store"):
+        file_name, stored = save_article(link, idx, search_query, page_content, article_title, index, archive)
+    metrics.inc("articles_total", outcome="saved" if stored else "duplicate")
+    if extractor and stored:
+        # Parsing runs in a worker process; only the finished record comes back to the event loop
+        try:
+            with metrics.stage("extract"):
+                record = await extractor.extract(page_content, link)
+        except Exception as e:
+            logging.error(f"Extraction failed for article {idx + 1}: {e}")
+            metrics.inc("extraction_failures_total", cause=type(e).__name__)
+        else:
+            record.update(path=file_name, query=search_query)
+            if record_sink:
+                # Crawl workers hand records to the coordinator, which owns articles.jsonl and the search index
+                record_sink(record)
+            else:
+                append_record(record)
+                if search:
+                    search.add(record)
+    return file_name
+
+async def scrape_and_save_article(browsers, link, idx, search_query, proxies, max_retries=3, fetcher=None, index=None, extractor=None, archive=None, search=None,
+                                  profile=None, render_stats=None, readiness=None, budget=None, record_sink=None):
+    # Fast path: most outlets serve the full article without JavaScript
+    if fetcher:
+        # Page bytes count against the shared budget from download until they are stored
+        async with reserve(budget) as held:
+            with metrics.stage("http_fetch"):
+                result = await fetcher.fetch_article(link)
+            if result:
+                metrics.inc("fetches_total", path="http")
+                page_content, article_title = result
+                await held.resize(len(page_content))
+                await store_article(link, idx, search_query, page_content, article_title, index, extractor, archive,
+                                    search, record_sink)
+                return True
+
     for retry in range(max_retries):
-        page = None
         try:
             proxy = random.choice(proxies) if proxies else None
             browser_args = ['--no-sandbox', '--disable-setuid-sandbox']
             if proxy:
                 browser_args.append(f'--proxy-server={proxy}')
 
-            page = await browser.newPage()
-            await page.setUserAgent(UserAgent().random)
-            await page.goto(link, options={'args': browser_args})
-            await asyncio.sleep(2)
-
-            page_content = await page.content()
-            title_element = await page.querySelector("h1")
-            article_title = await page.evaluate('(element) => element.textContent', title_element) if title_element else "UnknownTitle"
-            valid_title = ''.join(char for char in article_title if char.isalnum() or char.isspace())
-
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            file_name = os.path.join(output_directory, f"{timestamp}_{search_query}_{valid_title}_{idx + 1}.html")
+            # A recycled page from the worker's pool; a failed capture discards it instead of returning it
+            async with browsers.page() as page:
+                metrics.add("pages_in_flight", 1)
+                try:
+                    await page.setUserAgent(get_user_agent())
+                    # Block what the render profile doesn't need and count what is still transferred
+                    meter = RenderMeter(page)
+                    if fetcher:
+                        await fetcher.route_documents(page, profile, meter)
+                    else:
+                        await intercept(page, profile, meter=meter)
+                    if readiness:
+                        # Wait for DOMContentLoaded, an article/main/h1 element and a quiet network
+                        await readiness.goto(page, link, options={'args': browser_args})
+                    else:
+                        with metrics.stage("navigate"):
+                            await page.goto(link, options={'args': browser_args})
+                        with metrics.stage("sleep"):
+                            await asyncio.sleep(2)
 
-            with open(file_name, "w", encoding="utf-8") as file:
-                file.write(f"<a href='{link}' target='_blank'>Source Article</a>\n\n")
-                file.write(page_content)
+                    async with reserve(budget) as held:
+                        with metrics.stage("content"):
+                            page_content = await page.content()
+                        await held.resize(len(page_content))
+                        metrics.inc("fetches_total", path="browser")
+                        meter.stop()
+                        if profile and render_stats:
+                            render_stats.record(profile, meter)
+                        title_element = await page.querySelector("h1")
+                        article_title = await page.evaluate('(element) => element.textContent', title_element) if title_element else "UnknownTitle"
 
-            logging.info(f"Article {idx + 1} saved: {file_name}")
-            return
+                        await store_article(link, idx, search_query, page_content, article_title, index, extractor,
+                                            archive, search, record_sink)
+                finally:
+                    metrics.add("pages_in_flight", -1)
+            return True
         except Exception as e:
             logging.error(f"Error on attempt {retry + 1} for article {idx + 1}: {e}")
             if retry < max_retries - 1:
+                metrics.inc("retries_total", cause=type(e).__name__)
                 await asyncio.sleep(5)  # Wait before retrying
             else:
+                metrics.inc("articles_total", outcome="failed")
+                metrics.inc("failures_total", cause=type(e).__name__)
                 logging.error(f"Failed to scrape and save article {idx + 1} after {max_retries} retries.")
-        finally:
-            if page:
-                await page.close()
-
-async def get_article_links(query, max_articles, max_pages=5):
-    browser = await launch(headless=True)
-    page = await browser.newPage()
-    await page.setUserAgent(UserAgent().random)
-    all_links = []
+    return False
 
-    for p in range(max_pages):
-        try:
-            page_url = f"https://news.google.com/search?q={quote_plus(query)}&hl=en-US&gl=US&ceid=US:en&p={p}"
-            await page.goto(page_url)
-            await page.waitForSelector('article')
+async def get_feed_links(query, max_articles, fetcher, watermark=None, feed_url=news_feed_url):
+    """Result links from the Google News search feed, or None if the feed can't be used."""
+    await fetcher.start()
+    try:
+        with metrics.stage("discover"):
+            # With a watermark new items can sit anywhere in the feed, so read until enough of them are in
+            items, stopped_early = await fetch_feed_items(fetcher.session, query, max_articles, feed_url,
+                                           accept=(lambda item: not watermark.is_old(item)) if watermark else None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, etree.XMLSyntaxError) as e:
+        logging.warning(f"News feed failed for '{query}', falling back to the browser: {e}")
+        metrics.inc("discovery_fallbacks_total", cause=type(e).__name__)
+        return None
+    if not items:
+        logging.warning(f"News feed for '{query}' had no items, falling back to the browser")
+        metrics.inc("discovery_fallbacks_total", cause="empty")
+        return None
+    if watermark:
+        links, _ = watermark.take(items, max_articles)
+        if stopped_early:
+            # take() only saw the first max_articles new items; unread ones may be older than those
+            watermark.truncated = True
+    else:
+        links = [item["url"] for item in items]
+    logging.info(f"Found {len(links)} links for '{query}' in the news feed")
+    return links[:max_articles]
 
-            articles = await page.querySelectorAll('article')
-            links = [await page.evaluate('(article) => article.querySelector("a") ? article.querySelector("a").href : null', article) for article in articles]
-            all_links.extend(links)
+async def get_article_links(query, max_articles, max_pages=5, fetcher=None, watermark=None, search_url=news_search_url,
+                            discovery="rss", feed_url=news_feed_url, browsers=None):
+    """Collect result links for a query.
 
-            if len(all_links) >= max_articles:
-                break
-        except Exception as e:
-            logging.error(f"Error fetching article links: {e}")
-            break  # Exit the loop on error
+    ``discovery="rss"`` reads the search feed in one request over
+    ``fetcher``'s pooled session; if that fails (or there is no fetcher)
+    the search page is paged through in Chromium as before.
 
-    await browser.close()
+    With a ``watermark`` (see watermark.QueryWatermark) only results newer
+    than the last run are returned, and paging stops at the first result
+    page that reaches already-seen items. The browser fallback leases a page
+    from ``browsers`` (a BrowserPool), or launches a browser of its own.
+    """
+    if discovery == "rss" and fetcher:
+        links = await get_feed_links(query, max_articles, fetcher, watermark, feed_url)
+        if links is not None:
+            return links
+
+    own_browsers = browsers is None
+    if own_browsers:
+        browsers = BrowserPool(size=1, pages_per_browser=1)
+    all_links = []
+    try:
+        async with browsers.page() as page:
+            await page.setUserAgent(get_user_agent())
+            if fetcher:
+                # Result pages that have not changed are revalidated with a 304 instead of re-downloaded
+                await fetcher.route_documents(page)
+
+            for p in range(max_pages):
+                try:
+                    page_url = search_url.format(query=quote_plus(query), page=p)
+                    with metrics.stage("discover"):
+                        await page.goto(page_url)
+                        await page.waitForSelector('article')
+                        items = await page.evaluate(collect_links_js)
+                    if watermark:
+                        links, reached = watermark.take(items, max_articles - len(all_links))
+                        all_links.extend(links)
+                        if reached:
+                            logging.info(f"Reached the previous run's results on page {p + 1}; {len(all_links)} new links")
+                            break
+                    else:
+                        all_links.extend(item["url"] for item in items)
+
+                    if len(all_links) >= max_articles:
+                        break
+                except Exception as e:
+                    logging.error(f"Error fetching article links: {e}")
+                    break  # Exit the loop on error
+    finally:
+        if own_browsers:
+            await browsers.close()
     return all_links[:max_articles]
 
-async def scrape_articles(search_query, max_articles, proxies):
-    browser = None
+async def scrape_articles(search_query, max_articles, proxies, concurrency=8, per_host=2, storage="archive",
+                          render_profile="text", checkpoint=None, watermarks=None,
+                          max_inflight_bytes=default_budget_bytes, record_sink=None, archive_writer=None,
+                          discovery="rss", extractor=None, browsers=None, feed_url=news_feed_url,
+                          search_url=news_search_url):
+    """Capture up to max_articles for a query; returns counts of links found, saved and failed.
+
+    ``checkpoint`` (see job_queue.JobCheckpoint) records each finished article
+    so a resumed job never redoes one. ``watermarks`` (a WatermarkStore) makes
+    the run incremental: only results newer than the query's last run are
+    fetched, and the watermark advances once they are captured.
+    ``max_inflight_bytes`` caps page content held in memory across all
+    concurrent captures. ``record_sink`` and ``archive_writer`` are for
+    crawl.py workers: records go to the sink instead of articles.jsonl and
+    the search index, and archive shards are named after the writer.
+    ``discovery`` is "rss" (feed, browser fallback) or "browser", reading
+    ``feed_url`` or ``search_url``.
+    ``extractor`` and ``browsers`` (a BrowserPool) let a long-running caller
+    share one extraction process and one Chromium across queries; without
+    them the run starts and closes its own. Chromium is only launched once a
+    page actually needs it.
+    """
+    own_browsers = browsers is None
+    if own_browsers:
+        browsers = BrowserPool(size=1, pages_per_browser=concurrency)
+    fetcher = HttpFetcher()
+    index = DedupIndex()
+    own_extractor = extractor is None
+    if own_extractor:
+        extractor = ExtractionPool()
+    # "archive" appends to compressed shards; "files" keeps one .html file per article
+    archive = ShardedArchive(writer=archive_writer) if storage == "archive" else None
+    search = SearchIndex() if record_sink is None else None
+    resolver = LinkResolver()
+    # "full" loads everything, "text" drops images/fonts/CSS/media and ad hosts, "static" also disables JS
+    profile = profiles[render_profile]
+    render_stats = RenderStats()
+    readiness = ReadinessEngine()
+    budget = ByteBudget(max_inflight_bytes)
+    watermark = watermarks.open(search_query) if watermarks else None
+    summary = {"links": 0, "skipped": 0, "saved": 0, "failed": 0}
+
+    async def capture(link, idx):
+        # End to end per article, whichever path (HTTP or browser) it took
+        with metrics.stage("article"):
+            ok = await scrape_and_save_article(browsers, link, idx, search_query, proxies, fetcher=fetcher,
+                                               index=index, extractor=extractor, archive=archive, search=search,
+                                               profile=profile, render_stats=render_stats, readiness=readiness,
+                                               budget=budget, record_sink=record_sink)
+        if checkpoint:
+            checkpoint.mark(link, ok)
+        return ok
+
     try:
-        article_links = await get_article_links(search_query, max_articles)
-        browser = await launch(headless=True)
-        tasks = [scrape_and_save_article(browser, link, idx, search_query, proxies) for idx, link in enumerate(article_links)]
-        await asyncio.gather(*tasks)
+        result_links = await get_article_links(search_query, max_articles, fetcher=fetcher, watermark=watermark,
+                                               discovery=discovery, browsers=browsers, feed_url=feed_url,
+                                               search_url=search_url)
+        # Swap Google News redirect links for publisher URLs before dedup and scheduling
+        await fetcher.start()
+        with metrics.stage("resolve"):
+            resolved = await resolver.resolve_all(fetcher.session, result_links)
+        result_of = dict(zip(resolved, result_links))
+        article_links = [link for link in dict.fromkeys(resolved) if link]
+        summary["links"] = len(article_links)
+        if checkpoint:
+            article_links = [link for link in article_links if not checkpoint.done(link)]
+        # Skip anything an earlier run already captured before spending a request on it
+        new_links = index.filter_new(article_links, search_query)
+        summary["skipped"] = summary["links"] - len(new_links)
+        if checkpoint:
+            for link in set(article_links) - set(new_links):
+                checkpoint.mark(link, True)
+        if not new_links:
+            if watermark:
+                watermark.commit()
+            return summary
+        scheduler = PoliteScheduler(concurrency=concurrency, per_host=per_host, budget=budget)
+        for idx, link in enumerate(new_links):
+            scheduler.submit(link, lambda link=link, idx=idx: capture(link, idx))
+        results = await scheduler.run()
+        summary["saved"] = sum(1 for ok in results if ok is True)
+        summary["failed"] = len(results) - summary["saved"]
+        if watermark:
+            # Failed articles stay below the watermark so the next refresh tries them again
+            watermark.commit(result_of[link] for link, ok in zip(new_links, results) if ok is not True)
+        return summary
     finally:
-        if browser:
-            await browser.close()
+        # First, so an error closing any of the stores below can't leak a Chromium process
+        if own_browsers:
+            await browsers.close()
+        await fetcher.close()
+        index.close()
+        if own_extractor:
+            extractor.close()
+        if archive:
+            archive.close()
+        if search:
+            search.close()
+        resolver.close()
+        render_stats.report()
+        render_stats.save()
+        readiness.save()
+        logging.info(f"Peak page bytes in flight: {budget.peak / 1024 / 1024:.1f} MB of {budget.max_bytes / 1024 / 1024:.0f} MB")
+        summary["peak_bytes"] = budget.peak
+        metrics.summary()
+        metrics.write()
 
 # Ethical Consideration Note:
 # Ensure to comply with the terms of service of the websites and respect robots.txt files.
@@ -0,0 +1,495 @@
+# search_index.py
+import argparse
+import fcntl
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import shutil
+import threading
+from array import array
+from contextlib import contextmanager
+
+index_directory = os.path.join("Saved_Articles", "search_index")
+
+token_re = re.compile(r"\w+", re.UNICODE)
+query_token_re = re.compile(r'"([^"]*)"|(\()|(\))|(\S+)')
+
+# BM25 parameters
+k1 = 1.2
+b = 0.75
+
+
+def tokenize(text):
+    return [token.lower() for token in token_re.findall(text or "")]
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def write_segment(path, docs, inverted):
+    """Write an immutable segment. ``inverted`` maps term -> [(doc, positions), ...] sorted by doc.
+
+    postings.bin is a flat array of uint32: for every posting ``doc, tf, pos1..posN``.
+    lexicon.json maps term -> [offset, length, df] into that array.
+    """
+    tmp_path = path + ".tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    lexicon = {}
+    offset = 0
+    with open(os.path.join(tmp_path, "postings.bin"), "wb") as f:
+        for term in sorted(inverted):
+            values = array("I")
+            for doc, positions in inverted[term]:
+                values.append(doc)
+                values.append(len(positions))
+                values.extend(positions)
+            values.tofile(f)
+            lexicon[term] = [offset, len(values), len(inverted[term])]
+            offset += len(values)
+    with open(os.path.join(tmp_path, "docs.jsonl"), "w", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    _write_json(os.path.join(tmp_path, "lexicon.json"), lexicon)
+    _write_json(os.path.join(tmp_path, "meta.json"),
+                {"docs": len(docs), "total_length": sum(doc["length"] for doc in docs)})
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """Read-only view of one segment; postings are memory-mapped, not loaded."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.doc_count = meta["docs"]
+        self.total_length = meta["total_length"]
+        with open(os.path.join(path, "lexicon.json"), encoding="utf-8") as f:
+            self.lexicon = json.load(f)
+        with open(os.path.join(path, "docs.jsonl"), encoding="utf-8") as f:
+            self.docs = [json.loads(line) for line in f]
+        self._file = open(os.path.join(path, "postings.bin"), "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._values = memoryview(self._mmap).cast("I")
+        else:
+            self._mmap = None
+            self._values = memoryview(array("I"))
+
+    def doc_freq(self, term):
+        entry = self.lexicon.get(term)
+        return entry[2] if entry else 0
+
+    def postings(self, term):
+        """Yield (doc, positions) for ``term`` straight out of the mapped file."""
+        entry = self.lexicon.get(term)
+        if not entry:
+            return
+        values = self._values
+        i, end = entry[0], entry[0] + entry[1]
+        while i < end:
+            doc, tf = values[i], values[i + 1]
+            yield doc, values[i + 2:i + 2 + tf]
+            i += 2 + tf
+
+    def close(self):
+        try:
+            self._values.release()
+            if self._mmap:
+                self._mmap.close()
+        except BufferError as e:
+            # A postings slice is still referenced somewhere; the mapping goes when it does
+            logging.debug(f"Segment {self.name} still in use at close: {e}")
+        self._file.close()
+
+
+def parse_query(text):
+    """Parse ``a b``, ``a AND b``, ``a OR b``, ``NOT a``, ``"exact phrase"`` and parentheses into a tree."""
+    tokens = []
+    for phrase, lparen, rparen, word in query_token_re.findall(text):
+        if lparen or rparen:
+            tokens.append(lparen or rparen)
+        elif word in ("AND", "OR", "NOT"):
+            tokens.append(word)
+        elif word:
+            terms = tokenize(word)
+            if terms:
+                tokens.append(("term", terms[0]) if len(terms) == 1 else ("phrase", terms))
+        else:
+            terms = tokenize(phrase)
+            if terms:
+                tokens.append(("phrase", terms))
+
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() == "NOT":
+            take()
+            return ("not", parse_not())
+        return parse_atom()
+
+    def parse_atom():
+        token = take() if peek() is not None else None
+        if token == "(":
+            node = parse_or()
+            if peek() == ")":
+                take()
+            return node
+        if isinstance(token, tuple):
+            return token
+        raise ValueError(f"Unexpected {token!r} in query")
+
+    if not tokens:
+        raise ValueError("Empty query")
+    tree = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"Unexpected {tokens[position]!r} in query")
+    return tree
+
+
+def positive_terms(node, negated=False):
+    """Terms that should contribute to the score (everything not under a NOT)."""
+    kind = node[0]
+    if kind == "term":
+        return [] if negated else [node[1]]
+    if kind == "phrase":
+        return [] if negated else list(node[1])
+    if kind == "not":
+        return positive_terms(node[1], not negated)
+    return positive_terms(node[1], negated) + positive_terms(node[2], negated)
+
+
+def _matches(segment, node):
+    kind = node[0]
+    if kind == "term":
+        return {doc for doc, _ in segment.postings(node[1])}
+    if kind == "phrase":
+        terms = node[1]
+        first, *rest = terms
+        # Map doc -> start positions of the first word, then require each next word right after
+        starts = {doc: set(positions) for doc, positions in segment.postings(first)}
+        for offset, term in enumerate(rest, 1):
+            if not starts:
+                break
+            nxt = {}
+            for doc, positions in segment.postings(term):
+                if doc in starts:
+                    hits = {p - offset for p in positions} & starts[doc]
+                    if hits:
+                        nxt[doc] = hits
+            starts = nxt
+        return set(starts)
+    if kind == "not":
+        return set(range(segment.doc_count)) - _matches(segment, node[1])
+    left, right = _matches(segment, node[1]), _matches(segment, node[2])
+    return left & right if kind == "and" else left | right
+
+
+def _passes_filters(doc, since, until, tag):
+    if tag and (doc.get("query") or "").lower() != tag.lower():
+        return False
+    if since or until:
+        published = (doc.get("published") or "")[:10]
+        if not published or (since and published < since) or (until and published > until):
+            return False
+    return True
+
+
+class SearchIndex:
+    """Segment-based inverted index with BM25 ranking, updated one article at a time.
+
+    New documents are buffered in memory and flushed as a small immutable
+    segment every ``flush_every`` documents; nothing already on disk is ever
+    rewritten by an add. Once ``merge_factor`` segments of a similar size
+    pile up they are merged into one in a background thread.
+
+    Several processes may write the same index (batch.py workers each open
+    one): segment numbering and manifest updates happen under an exclusive
+    lock on ``index.lock``, re-reading the manifest first, so each writer
+    adds to what the others wrote instead of overwriting it.
+    """
+
+    def __init__(self, directory=index_directory, flush_every=32, merge_factor=8, background_merges=True):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.merge_factor = merge_factor
+        self.background_merges = background_merges
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(directory, "index.lock"), "a")
+        self._merging = False
+        self._merge_thread = None
+        # Searches and merges reading segments right now, and segments merged away that must outlive them
+        self._readers = 0
+        self._retired = []
+        self.manifest_path = os.path.join(directory, "segments.json")
+        self.segments = []
+        with self._locked():
+            self._sync_segments(self._read_manifest())
+        self._buffer_docs = []
+        self._buffer_postings = {}
+
+    @contextmanager
+    def _locked(self):
+        """This process's thread lock plus the cross-process lock; flock alone doesn't exclude threads."""
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"next": 1, "segments": []}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _sync_segments(self, manifest):
+        """Match the open segments to ``manifest``: open other writers' new ones, retire merged-away ones."""
+        self.next_segment = manifest["next"]
+        current = {segment.name: segment for segment in self.segments}
+        self.segments = [current.pop(name, None) or Segment(os.path.join(self.directory, name))
+                         for name in manifest["segments"]]
+        self._retire(current.values())
+
+    def _retire(self, segments):
+        # Called with the lock held; a search or merge that copied the segment list may still be reading these
+        self._retired.extend(segments)
+        if not self._readers:
+            for segment in self._retired:
+                segment.close()
+            self._retired = []
+
+    def _new_segment_path(self):
+        # Reserve the number in the manifest, so no other writer can pick the same one
+        with self._locked():
+            manifest = self._read_manifest()
+            name = f"seg-{manifest['next']:06d}"
+            manifest["next"] += 1
+            _write_json(self.manifest_path, manifest)
+            self._sync_segments(manifest)
+        return os.path.join(self.directory, name)
+
+    def _save_manifest(self):
+        _write_json(self.manifest_path, {"next": self.next_segment, "segments": [s.name for s in self.segments]})
+
+    def add(self, record):
+        """Index one extraction record (title, text, url, published, query, path)."""
+        doc = len(self._buffer_docs)
+        tokens = tokenize(record.get("title")) + tokenize(record.get("text"))
+        positions = {}
+        for position, token in enumerate(tokens):
+            positions.setdefault(token, []).append(position)
+        for token, token_positions in positions.items():
+            self._buffer_postings.setdefault(token, []).append((doc, token_positions))
+        self._buffer_docs.append({
+            "url": record.get("url"),
+            "title": record.get("title"),
+            "published": record.get("published"),
+            "query": record.get("query"),
+            "path": record.get("path"),
+            "length": len(tokens),
+        })
+        if len(self._buffer_docs) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer_docs:
+            return
+        path = self._new_segment_path()
+        write_segment(path, self._buffer_docs, self._buffer_postings)
+        self._buffer_docs, self._buffer_postings = [], {}
+        with self._locked():
+            self._sync_segments(self._read_manifest())
+            self.segments.append(Segment(path))
+            self._save_manifest()
+        self.maybe_merge()
+
+    def _merge_candidates(self):
+        tiers = {}
+        for segment in self.segments:
+            tier = int(math.log(max(segment.doc_count, 1), self.merge_factor))
+            tiers.setdefault(tier, []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return None
+
+    def maybe_merge(self):
+        with self._lock:
+            if self._merging:
+                return
+            candidates = self._merge_candidates()
+            if not candidates:
+                return
+            self._merging = True
+        if self.background_merges:
+            self._merge_thread = threading.Thread(target=self._merge_loop, args=(candidates,), daemon=True)
+            self._merge_thread.start()
+        else:
+            self._merge_loop(candidates)
+
+    def _merge_loop(self, candidates):
+        try:
+            while candidates:
+                self._merge(candidates)
+                # A merge can complete a higher tier
+                with self._lock:
+                    candidates = self._merge_candidates()
+        finally:
+            with self._lock:
+                self._merging = False
+
+    def _merge(self, segments):
+        docs, inverted = [], {}
+        with self._lock:
+            self._readers += 1
+        try:
+            for segment in segments:
+                base = len(docs)
+                docs.extend(segment.docs)
+                for term in segment.lexicon:
+                    inverted.setdefault(term, []).extend(
+                        (base + doc, list(positions)) for doc, positions in segment.postings(term))
+        finally:
+            with self._lock:
+                self._readers -= 1
+                self._retire([])
+        path = self._new_segment_path()
+        write_segment(path, docs, inverted)
+        with self._locked():
+            self._sync_segments(self._read_manifest())
+            names = [s.name for s in self.segments]
+            if not all(segment.name in names for segment in segments):
+                # Another writer merged some of these first; its result already holds the documents
+                shutil.rmtree(path, ignore_errors=True)
+                logging.info(f"Dropped merge into {os.path.basename(path)}: inputs were merged by another writer")
+                return
+            merged = Segment(path)
+            first = names.index(segments[0].name)
+            inputs = {segment.name for segment in segments}
+            old = [s for s in self.segments if s.name in inputs]
+            self.segments = [s for s in self.segments if s.name not in inputs]
+            self.segments.insert(first, merged)
+            self._save_manifest()
+            # The candidate objects and the ones _sync_segments holds are the same unless the list was reloaded
+            self._retire({id(s): s for s in list(segments) + old}.values())
+        logging.info(f"Merged {len(segments)} search segments into {merged.name} ({merged.doc_count} docs)")
+        for segment in segments:
+            # Searches still holding the old segment keep working off their open mapping
+            try:
+                shutil.rmtree(segment.path)
+            except OSError as e:
+                logging.debug(f"Could not remove merged segment {segment.path}: {e}")
+
+    def search(self, query, limit=10, since=None, until=None, tag=None):
+        """Return up to ``limit`` (score, doc) pairs, best first. Dates are YYYY-MM-DD strings."""
+        tree = parse_query(query)
+        terms = positive_terms(tree)
+        with self._lock:
+            segments = list(self.segments)
+            self._readers += 1
+        try:
+            return self._search(segments, tree, terms, limit, since, until, tag)
+        finally:
+            with self._lock:
+                self._readers -= 1
+                self._retire([])
+
+    def _search(self, segments, tree, terms, limit, since, until, tag):
+        doc_count = sum(s.doc_count for s in segments)
+        if not doc_count:
+            return []
+        avg_length = sum(s.total_length for s in segments) / doc_count
+        idf = {}
+        for term in set(terms):
+            df = sum(s.doc_freq(term) for s in segments)
+            idf[term] = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+        results = []
+        for segment in segments:
+            matched = {doc for doc in _matches(segment, tree) if _passes_filters(segment.docs[doc], since, until, tag)}
+            if not matched:
+                continue
+            scores = dict.fromkeys(matched, 0.0)
+            for term in set(terms):
+                for doc, positions in segment.postings(term):
+                    if doc in scores:
+                        tf = len(positions)
+                        norm = k1 * (1 - b + b * segment.docs[doc]["length"] / avg_length)
+                        scores[doc] += idf[term] * tf * (k1 + 1) / (tf + norm)
+            results.extend((score, segment.docs[doc]) for doc, score in scores.items())
+        return heapq.nlargest(limit, results, key=lambda item: item[0])
+
+    def close(self):
+        self.flush()
+        if self._merge_thread:
+            self._merge_thread.join()
+            self._merge_thread = None
+        with self._lock:
+            self._retire(self.segments)
+            self.segments = []
+        self._lock_file.close()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Search captured articles")
+    parser.add_argument("query", nargs="?", help='Query, e.g. \'election AND (senate OR house) NOT "opinion poll"\'')
+    parser.add_argument("-n", "--limit", type=int, default=10, help="Number of results")
+    parser.add_argument("--since", help="Only articles published on or after YYYY-MM-DD")
+    parser.add_argument("--until", help="Only articles published on or before YYYY-MM-DD")
+    parser.add_argument("--tag", help="Only articles captured for this search query")
+    parser.add_argument("--index", default=index_directory, help="Index directory")
+    parser.add_argument("--add", metavar="RECORDS", help="Index an articles.jsonl file of extraction records first")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+    index = SearchIndex(args.index, flush_every=1000, background_merges=False)
+    try:
+        if args.add:
+            with open(args.add, encoding="utf-8") as f:
+                for line in f:
+                    index.add(json.loads(line))
+            index.flush()
+        if args.query:
+            for score, doc in index.search(args.query, args.limit, args.since, args.until, args.tag):
+                print(f"{score:7.3f}  {(doc.get('published') or '')[:10]:10}  {doc.get('title')}")
+                print(f"         {doc.get('url')}  [{doc.get('query')}]")
+    finally:
+        index.close()
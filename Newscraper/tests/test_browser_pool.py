@@ -0,0 +1,223 @@
+import asyncio
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, method, params=None):
+        self.sent.append((method, params))
+
+
+class FakePage:
+    def __init__(self, fail_reset=False):
+        self.fail_reset = fail_reset
+        self.closed = False
+        self.listeners = {}
+        self._client = FakeClient()
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_all_listeners(self, event):
+        self.listeners.pop(event, None)
+
+    def isClosed(self):
+        return self.closed
+
+    async def evaluate(self, script):
+        return 2
+
+    async def goto(self, url):
+        if self.fail_reset:
+            raise RuntimeError("target closed")
+
+    async def setRequestInterception(self, enabled):
+        pass
+
+    async def setJavaScriptEnabled(self, enabled):
+        pass
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def newPage(self):
+        page = FakePage(fail_reset=self.browser.fail_reset)
+        self.browser.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, fail_reset=False):
+        self.fail_reset = fail_reset
+        self.process = None
+        self.closed = False
+        self.pages = []
+        self.contexts = []
+        self.listeners = {}
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+    def crash(self):
+        self.listeners[browser_pool.Browser.Events.Disconnected]()
+
+    async def createIncognitoBrowserContext(self):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+class Launcher:
+    """Stands in for pyppeteer.launch, keeping every browser it started."""
+
+    def __init__(self):
+        self.browsers = []
+        self.fail_reset = False
+
+    async def __call__(self, **options):
+        browser = FakeBrowser(self.fail_reset)
+        self.browsers.append(browser)
+        return browser
+
+
+@pytest.fixture
+def launched(monkeypatch):
+    launcher = Launcher()
+    monkeypatch.setattr(browser_pool, "launch", launcher)
+    return launcher
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_pages_go_to_the_least_leased_browser(launched):
+    async def scenario():
+        pool = BrowserPool(size=2, pages_per_browser=2)
+        async with pool.page():
+            async with pool.page():
+                return [pooled.leased for pooled in pool.browsers]
+
+    assert run(scenario()) == [1, 1]
+    assert len(launched.browsers) == 2
+
+
+def test_page_is_reset_and_reused(launched):
+    async def scenario():
+        pool = BrowserPool(size=1)
+        async with pool.page() as first:
+            first.on("request", lambda request: None)
+        async with pool.page() as second:
+            pass
+        await pool.close()
+        return first, second
+
+    first, second = run(scenario())
+    assert first is second
+    assert "request" not in first.listeners
+    assert ("Network.clearBrowserCookies", None) in first._client.sent
+
+
+def test_draining_browser_restarts_once_its_pages_are_back(launched):
+    async def scenario():
+        pool = BrowserPool(size=1, max_uses=2)
+        for _ in range(2):
+            async with pool.page():
+                pass
+        assert pool.browsers[0].draining
+        async with pool.page():
+            pass
+        return pool
+
+    pool = run(scenario())
+    assert len(launched.browsers) == 2
+    assert launched.browsers[0].closed
+    assert pool.browsers[0].browser is launched.browsers[1]
+    assert pool.browsers[0].uses == 1
+
+
+def test_draining_browser_with_pages_out_keeps_serving(launched):
+    async def scenario():
+        pool = BrowserPool(size=1, pages_per_browser=3, max_uses=1)
+        async with pool.page():
+            # Draining, but the outstanding page must not have its browser closed under it
+            async with pool.page():
+                pass
+        return pool
+
+    run(scenario())
+    assert len(launched.browsers) == 1
+    assert not launched.browsers[0].closed
+
+
+def test_crashed_browser_is_restarted(launched):
+    async def scenario():
+        pool = BrowserPool(size=1)
+        async with pool.page():
+            pass
+        launched.browsers[0].crash()
+        async with pool.page():
+            pass
+        return pool
+
+    pool = run(scenario())
+    assert len(launched.browsers) == 2
+    assert pool.browsers[0].browser is launched.browsers[1]
+    assert not pool.browsers[0].crashed
+
+
+def test_crashed_browser_with_pages_out_is_restarted_when_nothing_else_has_room(launched):
+    async def scenario():
+        pool = BrowserPool(size=1, pages_per_browser=2)
+        async with pool.page():
+            launched.browsers[0].crash()
+            async with pool.page():
+                pass
+
+    run(scenario())
+    assert len(launched.browsers) == 2
+
+
+def test_page_is_discarded_when_reset_fails(launched):
+    launched.fail_reset = True
+
+    async def scenario():
+        pool = BrowserPool(size=1)
+        async with pool.page():
+            pass
+        return pool
+
+    pool = run(scenario())
+    pooled = pool.browsers[0]
+    assert pooled.idle == []
+    assert pooled.leased == 0
+    assert launched.browsers[0].contexts[0].closed
+
+
+def test_page_is_discarded_after_an_error(launched):
+    async def scenario():
+        pool = BrowserPool(size=1)
+        with pytest.raises(RuntimeError):
+            async with pool.page():
+                raise RuntimeError("navigation failed")
+        return pool
+
+    pool = run(scenario())
+    assert pool.browsers[0].idle == []
+    assert pool.browsers[0].leased == 0
+    assert launched.browsers[0].contexts[0].closed
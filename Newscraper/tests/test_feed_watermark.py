@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import aiohttp
+from aiohttp import web
+
+from scraper import get_feed_links
+from watermark import WatermarkStore
+
+
+def feed(count):
+    # Newest first, a day apart, so every item is outside the watermark's grace of the one before it
+    newest = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+    items = "".join(
+        f"<item><title>Story {i}</title><link>https://example.com/story/{i}</link>"
+        f"<pubDate>{format_datetime(newest - timedelta(days=i))}</pubDate></item>"
+        for i in range(count))
+    return f'<?xml version="1.0"?><rss version="2.0"><channel>{items}</channel></rss>'
+
+
+class FeedFetcher:
+    def __init__(self, session):
+        self.session = session
+
+    async def start(self):
+        pass
+
+
+async def refresh(store, max_articles, runs):
+    body = feed(20)
+
+    async def handle(request):
+        return web.Response(text=body, content_type="application/rss+xml")
+
+    app = web.Application()
+    app.router.add_get("/rss", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    taken = []
+    try:
+        async with aiohttp.ClientSession() as session:
+            fetcher = FeedFetcher(session)
+            for _ in range(runs):
+                watermark = store.open("example")
+                links = await get_feed_links("example", max_articles, fetcher, watermark,
+                                             f"http://127.0.0.1:{port}/rss?q={{query}}")
+                watermark.commit()
+                taken.append(links)
+    finally:
+        await runner.cleanup()
+    return taken
+
+
+def test_feed_read_stopped_at_the_limit_leaves_the_rest_for_the_next_run(tmp_path):
+    store = WatermarkStore(str(tmp_path / "watermarks.sqlite3"))
+    try:
+        first, second = asyncio.run(refresh(store, 5, 2))
+    finally:
+        store.close()
+    assert first == [f"https://example.com/story/{i}" for i in range(5)]
+    assert second == [f"https://example.com/story/{i}" for i in range(5, 10)]
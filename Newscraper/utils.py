@@ -2,9 +2,19 @@
 import os
 from fake_useragent import UserAgent
 
+# Built on first use and shared: constructing a UserAgent loads its browser data (tens of ms)
+_user_agents = None
+
 def get_user_agent():
-    user_agent = UserAgent()
-    return user_agent.random
+    global _user_agents
+    if _user_agents is None:
+        _user_agents = UserAgent()
+    return _user_agents.random
+
+def iter_chunks(text, size=1 << 16):
+    """Slices of ``text`` so it can be encoded, hashed or written without a full-size copy."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
 
 def create_output_directory(directory_name):
     if not os.path.exists(directory_name):
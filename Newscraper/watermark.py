@@ -0,0 +1,129 @@
+# watermark.py
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+watermark_file = os.path.join("Saved_Articles", "watermarks.sqlite3")
+
+schema = """
+CREATE TABLE IF NOT EXISTS queries (
+    query TEXT PRIMARY KEY,
+    newest_published TEXT,
+    last_run TEXT NOT NULL,
+    runs INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS seen (
+    query TEXT NOT NULL,
+    url TEXT NOT NULL,
+    published TEXT,
+    first_seen TEXT NOT NULL,
+    PRIMARY KEY (query, url)
+);
+"""
+
+
+def parse_published(value):
+    """Google News gives ISO 8601 times like 2024-05-01T12:00:00Z; returns an aware datetime or None."""
+    if not value:
+        return None
+    try:
+        published = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return published if published.tzinfo else published.replace(tzinfo=timezone.utc)
+
+
+class QueryWatermark:
+    """How far one query has been read: the newest publish time and the result links already taken.
+
+    Results are not strictly ordered by time, so an item only counts as old
+    once it is more than ``grace`` older than the newest one seen before.
+    """
+
+    def __init__(self, store, query, newest, seen, grace):
+        self.store = store
+        self.query = query
+        self.newest = newest
+        self.seen = seen
+        self.grace = grace
+        self.discovered = {}
+        # Set when new results were left untaken, which then sit below nothing but their own unseen links
+        self.truncated = False
+
+    def is_old(self, item):
+        if item["url"] in self.seen:
+            return True
+        published = parse_published(item.get("published"))
+        return bool(self.newest and published and published < self.newest - self.grace)
+
+    def take(self, items, limit=None):
+        """Split one result page into new items; returns (new_links, reached) where reached means stop paginating.
+
+        Only the first ``limit`` new links are taken and remembered; the rest
+        are left for a later run.
+        """
+        new_links = []
+        reached = False
+        for item in items:
+            url = item.get("url")
+            if not url:
+                continue
+            if self.is_old(item):
+                reached = True
+            elif url not in self.discovered:
+                if limit is not None and len(new_links) >= limit:
+                    self.truncated = True
+                    continue
+                self.discovered[url] = item.get("published")
+                new_links.append(url)
+        return new_links, reached
+
+    def commit(self, failed=()):
+        """Remember everything discovered except ``failed`` links, so those are offered again next run."""
+        failed = set(failed)
+        kept = {url: published for url, published in self.discovered.items() if url not in failed}
+        times = [parse_published(published) for published in kept.values()]
+        newest = max([t for t in times if t] + ([self.newest] if self.newest else []), default=None)
+        if self.truncated:
+            # Untaken results may be older than what was taken; only the seen links advance this run
+            newest = self.newest
+        self.store.save(self.query, kept, newest)
+        logging.info(f"Watermark for '{self.query}': {len(kept)} new results, newest "
+                     f"{newest.isoformat() if newest else 'unknown'}")
+
+
+class WatermarkStore:
+    """Per-query watermarks kept between runs, so a refresh only pays for new results."""
+
+    def __init__(self, path=watermark_file, grace_hours=24, retention_days=30):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(schema)
+        self.grace = timedelta(hours=grace_hours)
+        # Seen links older than this have dropped out of Google's window and can be forgotten
+        self.retention = timedelta(days=retention_days)
+
+    def close(self):
+        self.conn.close()
+
+    def open(self, query):
+        row = self.conn.execute("SELECT newest_published FROM queries WHERE query = ?", (query,)).fetchone()
+        newest = parse_published(row[0]) if row else None
+        seen = {url for (url,) in self.conn.execute("SELECT url FROM seen WHERE query = ?", (query,))}
+        return QueryWatermark(self, query, newest, seen, self.grace)
+
+    def save(self, query, items, newest):
+        now = datetime.now(timezone.utc)
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO seen (query, url, published, first_seen) VALUES (?, ?, ?, ?)",
+                                  [(query, url, published, now.isoformat(timespec="seconds"))
+                                   for url, published in items.items()])
+            self.conn.execute(
+                "INSERT INTO queries (query, newest_published, last_run, runs) VALUES (?, ?, ?, 1)"
+                " ON CONFLICT(query) DO UPDATE SET newest_published = excluded.newest_published,"
+                " last_run = excluded.last_run, runs = runs + 1",
+                (query, newest.isoformat() if newest else None, now.isoformat(timespec="seconds")))
+            self.conn.execute("DELETE FROM seen WHERE query = ? AND first_seen < ?",
+                              (query, (now - self.retention).isoformat(timespec="seconds")))
@@ -1,10 +1,11 @@
 import asyncio
-import requests
+import aiohttp
 import json
 import os
 import sys
 import time
 import logging
+from github_client import GithubClient
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -51,18 +52,18 @@ class GithubUser:
         # Add more attributes as needed
 
 async def fetch_users_from_github(query, token=None):
-    url = f"https://api.github.com/search/users?q={query}&per_page=100"
-    headers = {
-        'Accept': 'application/vnd.github.v3+json',
-        'Authorization': f'token {token}' if token else None
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        logger.error(f"Failed to fetch data: {response.status_code}")
-        return []
-
-    data = response.json()
-    return data['items']
+    users = []
+    # Shared pooled client: pages stream in concurrently without blocking the event loop
+    async with GithubClient(token) as client:
+        try:
+            async for page in client.search_pages('users', query):
+                users.extend(page['items'])
+                logger.info(f"Fetched {len(page['items'])} users")
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"Failed to fetch data: {e.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to fetch data: {e}")
+    return users
 
 async def scrape_github_profiles_from_china(token=None):
     users_data = await fetch_users_from_github('location:China', token)
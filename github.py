@@ -1,74 +1,106 @@
-import requests
+import asyncio
+import aiohttp
 import os
 import json
-import time
 import logging
-from urllib.parse import urlencode
 from tkinter.filedialog import askdirectory
 import argparse
+from github_client import GithubClient
+from github_cache import ResponseCache, cache_file
+from github_output import UserSink
+from github_checkpoint import CrawlCheckpoint
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class GithubScraper:
-    def __init__(self, query, output_dir, rate_limit_threshold=10, delay=2):
+    def __init__(self, query, output_dir, rate_limit_threshold=10, concurrency=4, cache_path=cache_file,
+                 resume=False):
         self.query = query
-        self.base_url = 'https://api.github.com/search/users?'
-        self.headers = {'Accept': 'application/vnd.github.v3+json'}
         self.output_dir = output_dir
         self.rate_limit_threshold = rate_limit_threshold
-        self.delay = delay
+        self.concurrency = concurrency
+        self.cache_path = cache_path
+        self.per_page = 100
+        self.resume = resume
+        # Search results collected so far, appended page by page so a resumed run still has them
+        self.sink_name = 'github_search_users'
+        self.checkpoint_path = os.path.join(output_dir, 'github_search.checkpoint.json')
 
     def fetch_users(self):
-        params = {'q': self.query, 'per_page': 30}
-        users = []
-
-        while True:
-            try:
-                response = requests.get(self.base_url + urlencode(params), headers=self.headers)
-                response.raise_for_status()
-                self.check_rate_limit(response)
-                data = response.json()
-                users.extend(data['items'])
-                logger.info(f"Fetched {len(data['items'])} users")
-                time.sleep(self.delay)
-
-                if 'next' not in response.links:
-                    break
-
-                params['page'] = params.get('page', 1) + 1
-
-            except requests.exceptions.HTTPError as e:
-                logger.error(f"HTTP error: {e}")
-                break
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching data: {e}")
-                break
+        return asyncio.run(self.fetch_users_async())
 
+    async def fetch_users_async(self):
+        checkpoint = self.open_checkpoint()
+        if not checkpoint.done_pages:
+            # A fresh crawl must not pick up the users of an earlier one
+            for suffix in ('jsonl', 'idx'):
+                path = os.path.join(self.output_dir, f'{self.sink_name}.{suffix}')
+                if os.path.exists(path):
+                    os.remove(path)
+        sink = UserSink(self.output_dir, name=self.sink_name)
+        if checkpoint.complete:
+            logger.info(f"Checkpoint says the crawl of '{self.query}' is already complete")
+        else:
+            cache = ResponseCache(self.cache_path) if self.cache_path else None
+            # Pages are fetched concurrently; the client sleeps only as long as X-RateLimit-Reset/Retry-After require
+            async with GithubClient(concurrency=self.concurrency, rate_limit_threshold=self.rate_limit_threshold,
+                                    cache=cache) as client:
+                try:
+                    async for number, page in client.numbered_search_pages(
+                            'users', self.query, per_page=self.per_page,
+                            skip=checkpoint.done_pages, total_count=checkpoint.total_count):
+                        checkpoint.total_count = page.get('total_count', checkpoint.total_count)
+                        # Results shift between runs; users saved before a restart are not saved twice
+                        users = [user for user in page['items'] if user['login'] not in checkpoint.users]
+                        sink.append(users)
+                        checkpoint.page_done(number, [user['login'] for user in users])
+                        logger.info(f"Fetched page {number}: {len(users)} new users")
+                    checkpoint.finish()
+                except aiohttp.ClientResponseError as e:
+                    logger.error(f"HTTP error: {e}")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.error(f"Error fetching data: {e}")
+                finally:
+                    if cache:
+                        cache.close()
+            if not checkpoint.complete:
+                logger.info(f"Stopped with {len(checkpoint.done_pages)} pages done; "
+                            f"run again with --resume to continue")
+        users = sink.records()
+        sink.close()
         return users
 
+    def open_checkpoint(self):
+        if self.resume:
+            checkpoint = CrawlCheckpoint.load(self.checkpoint_path, self.query, self.per_page)
+            if checkpoint:
+                logger.info(f"Resuming '{self.query}': {len(checkpoint.done_pages)} pages and "
+                            f"{len(checkpoint.users)} users already done")
+                return checkpoint
+            logger.info(f"No checkpoint to resume for '{self.query}', starting from page 1")
+        return CrawlCheckpoint(self.checkpoint_path, self.query, self.per_page)
+
     def save_users(self, users):
         file_path = os.path.join(self.output_dir, 'github_users.json')
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(users, f, ensure_ascii=False, indent=4)
         logger.info(f"Saved {len(users)} users to {file_path}")
 
-    def check_rate_limit(self, response):
-        rate_limit_remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-        if rate_limit_remaining < self.rate_limit_threshold:
-            sleep_time = 60  # in seconds
-            logger.info(f"Approaching rate limit. Sleeping for {sleep_time} seconds.")
-            time.sleep(sleep_time)
-
 def parse_arguments():
     parser = argparse.ArgumentParser(description='GitHub Scraper')
     parser.add_argument('query', help='GitHub search query')
+    parser.add_argument('--cache-file', default=cache_file, help='ETag cache of API responses')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every response in full')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last run of this query from its checkpoint in the output directory')
     return parser.parse_args()
 
 if __name__ == '__main__':
     args = parse_arguments()
     output_dir = askdirectory(title='Choose Directory to Save Information')
-    scraper = GithubScraper(args.query, output_dir)
+    scraper = GithubScraper(args.query, output_dir, cache_path=None if args.no_cache else args.cache_file,
+                            resume=args.resume)
     users = scraper.fetch_users()
     scraper.save_users(users)
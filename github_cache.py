@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+# Shared by github.py and githubprofilescrape.py, whichever output directory a run picks
+cache_file = os.path.join(os.path.expanduser('~'), '.cache', 'github-scraper', 'responses.sqlite3')
+default_max_bytes = 256 * 1024 * 1024
+
+schema = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+'''
+
+
+def auth_identity(token):
+    # Responses differ per user (private repos, emails), but the token itself is never written to disk
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16] if token else 'anonymous'
+
+
+def request_url(url, params=None):
+    return f'{url}?{urlencode(sorted(params.items()))}' if params else url
+
+
+class ResponseCache:
+    """On-disk ETag cache for GitHub REST GETs with LRU eviction.
+
+    GitHub does not count a conditional request answered with 304 against
+    the rate limit, so a repeat run revalidates every page for free and
+    reads the body from here.
+    """
+
+    def __init__(self, path=cache_file, max_bytes=default_max_bytes):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(schema)
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+        logger.info(f"Response cache: {self.revalidated} revalidated (304), {self.misses} misses")
+
+    @staticmethod
+    def key(identity, url):
+        return hashlib.sha256(f'{identity} {url}'.encode('utf-8')).hexdigest()
+
+    def etag(self, key):
+        row = self.conn.execute('SELECT etag FROM responses WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def hit(self, key):
+        """Body stored for ``key`` after a 304, or None if it was evicted meanwhile."""
+        row = self.conn.execute('SELECT body FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.revalidated += 1
+        with self.conn:
+            self.conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def store(self, key, url, etag, body):
+        self.misses += 1
+        if not etag:
+            return
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, url, etag, body, size, last_access) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, url, etag, body, len(body), time.time()))
+        self.evict()
+
+    def evict(self):
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Down to 90% of the cap so a full cache doesn't evict on every store
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY last_access'):
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        with self.conn:
+            self.conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
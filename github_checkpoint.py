@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlCheckpoint:
+    """Progress of one search crawl, rewritten atomically after every finished page.
+
+    Records the query, which result pages are done and which users have
+    been saved, so a run stopped by an error, a timeout or a restart can
+    continue with --resume instead of starting again from page 1.
+    """
+
+    def __init__(self, path, query, per_page, total_count=None, done_pages=(), users=(), complete=False):
+        self.path = path
+        self.query = query
+        self.per_page = per_page
+        self.total_count = total_count
+        self.done_pages = set(done_pages)
+        self.users = set(users)
+        self.complete = complete
+
+    @classmethod
+    def load(cls, path, query, per_page):
+        """The checkpoint at ``path`` if it belongs to the same crawl, else None."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+            return None
+        if state.get('query') != query or state.get('per_page') != per_page:
+            logger.warning(f"Checkpoint {path} is for query '{state.get('query')}', not '{query}'")
+            return None
+        return cls(path, query, per_page, state.get('total_count'), state.get('done_pages', []),
+                   state.get('users', []), state.get('complete', False))
+
+    def save(self):
+        state = {
+            'query': self.query,
+            'per_page': self.per_page,
+            'total_count': self.total_count,
+            'done_pages': sorted(self.done_pages),
+            'users': sorted(self.users),
+            'complete': self.complete
+        }
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def page_done(self, page, logins):
+        self.done_pages.add(page)
+        self.users.update(logins)
+        self.save()
+
+    def finish(self):
+        self.complete = True
+        self.save()
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import aiohttp
+from github_cache import auth_identity, request_url
+
+logger = logging.getLogger(__name__)
+
+api_url = 'https://api.github.com'
+graphql_url = f'{api_url}/graphql'
+# GitHub only ever returns the first 1000 results of a search
+search_result_cap = 1000
+# Largest page GraphQL connections allow
+repos_per_page = 100
+# GraphQL refuses queries that could return more nodes than this
+graphql_node_limit = 500000
+# Worth another try: GitHub's own hiccups, not the request's fault
+retry_statuses = (500, 502, 503, 504)
+
+latest_commit_fields = '''
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        pushedAt
+        defaultBranchRef { target { ... on Commit { oid url message committedDate } } }
+      }'''
+
+
+class RateLimitGovernor:
+    """Token bucket whose tokens are GitHub's own quota for one resource.
+
+    Every response refills the bucket from X-RateLimit-Remaining/Limit/Reset
+    and every request takes a token. When the bucket is empty, callers sleep
+    until X-RateLimit-Reset and no longer; a Retry-After (secondary rate
+    limit) pauses every caller for as long as GitHub asks.
+    """
+
+    def __init__(self, reserve=0):
+        # Tokens left untouched, e.g. for other tools sharing the same token
+        self.reserve = reserve
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.refilled_for = None
+        self.paused_until = 0.0
+
+    async def acquire(self, cost=1):
+        """Take ``cost`` tokens: one per REST request, the estimated points for a GraphQL query."""
+        while True:
+            now = time.time()
+            if self._take(cost, now):
+                return
+            if self.paused_until > now:
+                wait = self.paused_until - now
+            else:
+                # Reset times are whole seconds, so allow one more for clock skew
+                wait = max(0.0, self.reset_at - now) + 1
+                logger.info(f"Rate limit reached, waiting {wait:.0f} seconds for the reset")
+            await asyncio.sleep(wait)
+
+    def _reserve(self, cost):
+        # Never hold back more than a whole window hands out, or no request could ever pass
+        if self.limit is None:
+            return self.reserve
+        return max(0, min(self.reserve, self.limit - cost))
+
+    def _take(self, cost, now):
+        if self.paused_until > now:
+            return False
+        if (self.remaining is not None and self.remaining - cost < self._reserve(cost) and now >= self.reset_at
+                and self.refilled_for != self.reset_at):
+            # A new window no response has told us about yet: assume the full quota once, until one does
+            self.remaining = self.limit
+            self.refilled_for = self.reset_at
+        if self.remaining is None or self.remaining - cost >= self._reserve(cost) or self.remaining == self.limit:
+            if self.remaining is not None:
+                self.remaining -= cost
+            return True
+        return False
+
+    def update(self, status, headers):
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            remaining = int(remaining)
+            reset_at = float(headers.get('X-RateLimit-Reset', 0))
+            if headers.get('X-RateLimit-Limit'):
+                self.limit = int(headers['X-RateLimit-Limit'])
+            if reset_at > self.reset_at:
+                self.reset_at = reset_at
+                self.remaining = remaining
+            elif reset_at == self.reset_at:
+                # Responses to concurrent requests arrive out of order; the lowest count is the current one
+                self.remaining = remaining if self.remaining is None else min(self.remaining, remaining)
+
+        retry_after = headers.get('Retry-After')
+        if status in (403, 429) and retry_after:
+            self.pause(float(retry_after))
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.time() + seconds)
+
+
+def is_rate_limited(status, headers, body):
+    if status == 429:
+        return True
+    return status == 403 and (headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in headers
+                              or 'rate limit' in body.lower())
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    # Full jitter, so concurrent requests that failed together don't retry together
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def latest_commits_query(count, per_page):
+    """One aliased query (u0, u1, ...) reading the default-branch head of every repository of ``count`` users."""
+    params = ', '.join(f'$login{i}: String!, $cursor{i}: String' for i in range(count))
+    users = '\n'.join(
+        f'  u{i}: user(login: $login{i}) {{\n'
+        f'    repositories(first: {per_page}, after: $cursor{i}, ownerAffiliations: OWNER, '
+        f'orderBy: {{field: PUSHED_AT, direction: DESC}}) {{{latest_commit_fields}\n    }}\n  }}'
+        for i in range(count))
+    return f'query({params}) {{\n  rateLimit {{ cost remaining }}\n{users}\n}}'
+
+
+def query_cost(connections):
+    # GitHub charges one point per 100 connection requests, and at least one point per query
+    return max(1, math.ceil(connections / 100))
+
+
+class GithubClient:
+    """Pooled keep-alive session for the GitHub REST and GraphQL APIs and github.com pages.
+
+    Requests go through one RateLimitGovernor per quota (search and core are
+    counted separately by GitHub) and at most ``concurrency`` are in flight.
+    Rate limits are waited out; server errors, dropped connections and
+    timeouts are retried with jittered exponential backoff. With a
+    ResponseCache, API GETs are sent with If-None-Match and a 304 is
+    answered from the cache.
+
+        async with GithubClient(token) as client:
+            async for page in client.search_pages('users', 'location:Berlin'):
+                ...
+    """
+
+    def __init__(self, token=None, concurrency=4, rate_limit_threshold=0, timeout=30, max_retries=5, cache=None):
+        # Only sent to the API, never to github.com pages
+        self.api_headers = {'Accept': 'application/vnd.github.v3+json'}
+        if token:
+            self.api_headers['Authorization'] = f'token {token}'
+        self.concurrency = concurrency
+        self.rate_limit_threshold = rate_limit_threshold
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.cache = cache
+        self.identity = auth_identity(token)
+        self.governors = {}
+        self.session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency * 2, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def governor(self, url):
+        if url == graphql_url:
+            resource = 'graphql'
+        elif not url.startswith(api_url):
+            resource = 'web'
+        else:
+            resource = 'search' if '/search/' in url else 'core'
+        if resource not in self.governors:
+            self.governors[resource] = RateLimitGovernor(self.rate_limit_threshold)
+        return self.governors[resource]
+
+    async def get_json(self, url, params=None):
+        """GET a JSON document, waiting out rate limits instead of failing on them."""
+        return await self.request_json('GET', url, params=params)
+
+    async def get_text(self, url):
+        """GET a page, e.g. a github.com profile, through the same pool, limits and retries."""
+        return (await self.request('GET', url)).decode('utf-8', errors='replace')
+
+    async def request_json(self, method, url, cost=1, **kwargs):
+        return json.loads(await self.request(method, url, cost=cost, **kwargs))
+
+    async def request(self, method, url, cost=1, **kwargs):
+        """Send one request and return the response body, retrying until it succeeds or plainly fails."""
+        await self.start()
+        governor = self.governor(url)
+        is_api = url.startswith(api_url)
+        cache_key = etag = None
+        if self.cache is not None and method == 'GET' and is_api:
+            full_url = request_url(url, kwargs.get('params'))
+            cache_key = self.cache.key(self.identity, full_url)
+            etag = self.cache.etag(cache_key)
+        for attempt in range(self.max_retries):
+            await governor.acquire(cost)
+            headers = dict(self.api_headers) if is_api else {}
+            if etag:
+                headers['If-None-Match'] = etag
+            try:
+                async with self._semaphore:
+                    async with self.session.request(method, url, headers=headers, **kwargs) as response:
+                        governor.update(response.status, response.headers)
+                        if response.status == 304 and cache_key:
+                            body = self.cache.hit(cache_key)
+                            if body is not None:
+                                return body
+                            # Evicted since the lookup: ask again without a validator
+                            etag = None
+                            continue
+                        if response.status in (403, 429):
+                            body = await response.text()
+                            if is_rate_limited(response.status, response.headers, body):
+                                if (response.headers.get('X-RateLimit-Remaining') != '0'
+                                        and 'Retry-After' not in response.headers):
+                                    # Secondary rate limit without a Retry-After: GitHub asks for at least a minute
+                                    governor.pause(60)
+                                logger.warning(f"Rate limited on {url} (attempt {attempt + 1}), waiting as GitHub asks")
+                                continue
+                        if response.status in retry_statuses and attempt < self.max_retries - 1:
+                            logger.warning(f"HTTP {response.status} from {url} (attempt {attempt + 1}), retrying")
+                        else:
+                            response.raise_for_status()
+                            body = await response.read()
+                            if cache_key:
+                                self.cache.store(cache_key, full_url, response.headers.get('ETag'), body)
+                            return body
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                logger.warning(f"Error fetching {url} (attempt {attempt + 1}): {e!r}, retrying")
+            await asyncio.sleep(backoff_delay(attempt))
+        raise aiohttp.ClientError(f"Gave up on {url} after {self.max_retries} attempts")
+
+    async def graphql(self, query, variables=None, cost=1):
+        """Run a GraphQL query (a token is required) and return its ``data``.
+
+        Errors for single aliases, e.g. a login that no longer exists, are
+        logged and leave that alias as None; only a query with no data raises.
+        """
+        result = await self.request_json('POST', graphql_url, cost=cost, json={'query': query, 'variables': variables or {}})
+        errors = result.get('errors') or []
+        for error in errors:
+            logger.warning(f"GraphQL error at {'.'.join(map(str, error.get('path') or [])) or 'query'}: {error.get('message')}")
+        if result.get('data') is None:
+            raise aiohttp.ClientError(f"GraphQL query failed: {'; '.join(e.get('message', '') for e in errors)}")
+        return result['data']
+
+    async def latest_commits(self, logins, max_repos=None, users_per_query=25, max_cost=1, sync=None):
+        """Map each login to the head commit of every repository it owns, newest push first.
+
+        Users are batched into aliased queries as large as ``max_cost`` points
+        allows; users with more repositories than one page are carried into
+        the next query with their cursor until ``max_repos`` or the end.
+        Returns {login: [{'repo_name', 'commit_url', 'commit_message', 'sha', 'pushed_at'}]}.
+
+        With a CommitSyncStore as ``sync``, listing a user stops at the first
+        repository whose pushed_at has not moved since the last sync (the
+        rest are older still and come from the store), and repositories with
+        a new head also get 'new_commits' since the last sync.
+        """
+        results = {login: [] for login in logins}
+        repo_counts = dict.fromkeys(logins, 0)
+        known = {login: sync.repos(login) for login in logins} if sync else {}
+        caught_up = set()
+        changed = []
+        per_page = min(repos_per_page, max_repos or repos_per_page)
+        # Each user is one connection request; keep the query within its point and node budgets
+        batch_size = max(1, min(users_per_query, max_cost * 100, graphql_node_limit // per_page))
+        pending = [(login, None) for login in logins]
+        queries = 0
+        while pending:
+            batch, pending = pending[:batch_size], pending[batch_size:]
+            variables = {}
+            for i, (login, cursor) in enumerate(batch):
+                variables[f'login{i}'] = login
+                variables[f'cursor{i}'] = cursor
+            estimate = query_cost(len(batch))
+            data = await self.graphql(latest_commits_query(len(batch), per_page), variables, cost=estimate)
+            queries += 1
+            rate_limit = data.get('rateLimit') or {}
+            if rate_limit.get('cost', estimate) > estimate:
+                logger.warning(f"GraphQL query cost {rate_limit['cost']} points, estimated {estimate}")
+
+            for i, (login, _) in enumerate(batch):
+                user = data.get(f'u{i}')
+                if user is None:
+                    continue
+                repos = user['repositories']
+                for repo in repos['nodes']:
+                    previous = known.get(login, {}).get(repo['name'])
+                    if previous and previous['pushed_at'] == repo['pushedAt']:
+                        # Sorted by push time, so this and every repository after it is unchanged
+                        caught_up.add(login)
+                        break
+                    repo_counts[login] += 1
+                    target = (repo.get('defaultBranchRef') or {}).get('target')
+                    # Empty repositories have no default branch head
+                    if target:
+                        record = {
+                            'repo_name': repo['name'],
+                            'commit_url': target['url'],
+                            'commit_message': target['message'],
+                            'sha': target['oid'],
+                            'pushed_at': repo['pushedAt']
+                        }
+                        results[login].append(record)
+                        if previous and previous['head_sha'] != target['oid']:
+                            changed.append((login, record, previous))
+                if (login not in caught_up and repos['pageInfo']['hasNextPage']
+                        and (max_repos is None or repo_counts[login] < max_repos)):
+                    pending.append((login, repos['pageInfo']['endCursor']))
+
+        if sync:
+            await asyncio.gather(*(self.add_new_commits(login, record, previous)
+                                   for login, record, previous in changed))
+            for login in logins:
+                sync.save(login, results[login])
+                if login in caught_up:
+                    listed = {record['repo_name'] for record in results[login]}
+                    results[login].extend(entry['record'] for name, entry in known[login].items()
+                                          if name not in listed)
+            logger.info(f"Commit sync: {sum(repo_counts.values())} repositories pushed to since the last sync, "
+                        f"{len(changed)} with new commits")
+
+        logger.info(f"Fetched latest commits of {sum(repo_counts.values())} repositories "
+                    f"for {len(logins)} users in {queries} GraphQL queries")
+        return results
+
+    async def add_new_commits(self, login, record, previous, limit=100):
+        """Set record['new_commits'] to the commits after ``previous['head_sha']``, asking only for those ``since`` the last push.
+
+        If the list can't be fetched, record['new_commits_error'] says why and
+        the sync store keeps the repository's previous head for the next run.
+        """
+        record['new_commits'] = new_commits = []
+        path = f"/repos/{login}/{record['repo_name']}/commits"
+        try:
+            async for page in self.paginate(path, {'since': previous['pushed_at']}, max_items=limit):
+                for commit in page:
+                    if commit['sha'] == previous['head_sha']:
+                        return
+                    new_commits.append({
+                        'sha': commit['sha'],
+                        'commit_url': commit['html_url'],
+                        'commit_message': commit['commit']['message']
+                    })
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"Error fetching new commits of {login}/{record['repo_name']}: {e}")
+            record['new_commits_error'] = str(e)
+
+    async def paginate(self, path, params=None, per_page=100, max_items=None):
+        """Yield the items of a paged REST list (``/users/{login}/repos``, ``.../commits``) one page at a time.
+
+        Pages are requested by number, one after another, so nothing past
+        the page being consumed is held; a short page is the last one.
+        """
+        url = path if path.startswith(api_url) else f'{api_url}{path}'
+        page = 1
+        seen = 0
+        while True:
+            items = await self.get_json(url, {**(params or {}), 'per_page': per_page, 'page': page})
+            if max_items is not None:
+                items = items[:max_items - seen]
+            if items:
+                yield items
+            seen += len(items)
+            if len(items) < per_page or (max_items is not None and seen >= max_items):
+                return
+            page += 1
+
+    async def search_pages(self, kind, query, per_page=100, max_results=search_result_cap):
+        """Yield every page of a search (users, repositories, ...) in order.
+
+        The first page tells us how many there are; the rest are then
+        fetched concurrently, bounded by ``concurrency`` and the quota.
+        """
+        async for _, page in self.numbered_search_pages(kind, query, per_page, max_results):
+            yield page
+
+    async def numbered_search_pages(self, kind, query, per_page=100, max_results=search_result_cap,
+                                    skip=(), total_count=None):
+        """Like search_pages, as (page number, page), leaving out the page numbers in ``skip``.
+
+        A resumed crawl passes the pages it already has and the total_count
+        it saw, so not even the first page is fetched twice.
+        """
+        url = f'{api_url}/search/{kind}'
+        if total_count is None or 1 not in skip:
+            first = await self.get_json(url, {'q': query, 'per_page': per_page, 'page': 1})
+            total_count = first.get('total_count', 0)
+            if 1 not in skip:
+                yield 1, first
+        pages = math.ceil(min(total_count, max_results) / per_page)
+        tasks = [(page, asyncio.ensure_future(self.get_json(url, {'q': query, 'per_page': per_page, 'page': page})))
+                 for page in range(2, pages + 1) if page not in skip]
+        try:
+            for page, task in tasks:
+                yield page, await task
+        finally:
+            for _, task in tasks:
+                task.cancel()
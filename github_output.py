@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+fsync_policies = ('record', 'batch', 'none')
+
+
+class UserSink:
+    """Append-only JSON Lines output, one user record per line.
+
+    Each batch is appended and (per ``fsync``) synced, so saving costs the
+    same however long the file already is and a crash loses at most the
+    line being written. A sidecar index maps each login to the offset of
+    its latest record; compact() merges repeated records per login and
+    export_json() writes the old pretty-printed JSON array.
+    """
+
+    def __init__(self, output_dir, name='github_users', fsync='batch'):
+        if fsync not in fsync_policies:
+            raise ValueError(f"fsync must be one of {', '.join(fsync_policies)}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, f'{name}.jsonl')
+        self.index_path = os.path.join(output_dir, f'{name}.idx')
+        self.json_path = os.path.join(output_dir, f'{name}.json')
+        self.fsync = fsync
+        self.index = {}
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, 'ab+')
+        self._truncate_partial_line()
+        self.index, indexed_end = self._load_index()
+        # Records appended after the last index write (e.g. a crash in between) are indexed now
+        missing = list(self._scan(indexed_end))
+        self.index_file = open(self.index_path, 'a', encoding='utf-8')
+        self._write_index(missing)
+
+    def _truncate_partial_line(self):
+        size = self.file.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        self.file.seek(size - 1)
+        if self.file.read(1) == b'\n':
+            return
+        # The last append was cut off mid-record: drop it back to the previous complete line
+        position = size
+        while position > 0:
+            start = max(0, position - 64 * 1024)
+            self.file.seek(start)
+            newline = self.file.read(position - start).rfind(b'\n')
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        logger.warning(f"Dropping {size - position} bytes of an incomplete record at the end of {self.path}")
+        self.file.truncate(position)
+
+    def _load_index(self):
+        index = {}
+        indexed_end = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        login, offset, end = json.loads(line)
+                    except ValueError:
+                        break
+                    index[login] = offset
+                    indexed_end = max(indexed_end, end)
+        size = self.file.seek(0, os.SEEK_END)
+        if indexed_end > size:
+            # The data file was replaced or truncated behind the index's back: start over
+            index, indexed_end = {}, 0
+            open(self.index_path, 'w').close()
+        return index, indexed_end
+
+    def _scan(self, start=0):
+        """(login, offset, end) for every record from byte ``start`` on."""
+        self.file.seek(start)
+        offset = start
+        for line in self.file:
+            end = offset + len(line)
+            yield json.loads(line)['login'], offset, end
+            offset = end
+
+    def _write_index(self, entries):
+        for login, offset, end in entries:
+            self.index[login] = offset
+            self.index_file.write(json.dumps([login, offset, end]) + '\n')
+        self.index_file.flush()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, users):
+        entries = []
+        offset = self.file.seek(0, os.SEEK_END)
+        for user in users:
+            line = (json.dumps(user, ensure_ascii=False) + '\n').encode('utf-8')
+            self.file.write(line)
+            entries.append((user['login'], offset, offset + len(line)))
+            offset += len(line)
+            if self.fsync == 'record':
+                self._sync()
+        if self.fsync == 'batch':
+            self._sync()
+        else:
+            self.file.flush()
+        # The index is only written once the records it points at are on disk
+        self._write_index(entries)
+        logger.info(f"Appended {len(entries)} users to {self.path}")
+
+    def get(self, login):
+        offset = self.index.get(login)
+        if offset is None:
+            return None
+        self.file.seek(offset)
+        return json.loads(self.file.readline())
+
+    def __contains__(self, login):
+        return login in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def records(self):
+        """One record per login, merging every saved update in order, in first-seen order."""
+        merged = {}
+        self.file.seek(0)
+        for line in self.file:
+            user = json.loads(line)
+            merged[user['login']] = {**merged.get(user['login'], {}), **user}
+        return list(merged.values())
+
+    def compact(self):
+        """Rewrite the file with one merged record per login; a no-op when nothing repeats."""
+        lines = sum(1 for _ in self._scan())
+        if lines == len(self.index):
+            return
+        users = self.records()
+        self.close()
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            for user in users:
+                f.write((json.dumps(user, ensure_ascii=False) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Stale after the rewrite; _open rebuilds it from the compacted file
+        os.remove(self.index_path)
+        self._open()
+        logger.info(f"Compacted {lines} records into {len(users)} in {self.path}")
+
+    def export_json(self, path=None):
+        path = path or self.json_path
+        users = self.records()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(users, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+        logger.info(f"Exported {len(users)} users to {path}")
+        return path
+
+    def close(self):
+        self.file.close()
+        self.index_file.close()
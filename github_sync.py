@@ -0,0 +1,56 @@
+import json
+import os
+import sqlite3
+import time
+from github_cache import cache_file
+
+sync_file = os.path.join(os.path.dirname(cache_file), 'commit_sync.sqlite3')
+
+schema = '''
+CREATE TABLE IF NOT EXISTS repos (
+    login TEXT NOT NULL,
+    name TEXT NOT NULL,
+    head_sha TEXT NOT NULL,
+    pushed_at TEXT,
+    record TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (login, name)
+);
+'''
+
+
+class CommitSyncStore:
+    """Per-repository watermarks (head SHA and pushed_at) from the last commit sync.
+
+    With these, GithubClient.latest_commits() stops listing a user's
+    repositories at the first one that has not been pushed to since, and
+    only asks for commits ``since`` the last sync where the head moved.
+    """
+
+    def __init__(self, path=sync_file):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(schema)
+
+    def close(self):
+        self.conn.close()
+
+    def repos(self, login):
+        """{name: {'head_sha', 'pushed_at', 'record'}} for every repository of ``login`` synced before."""
+        rows = self.conn.execute('SELECT name, head_sha, pushed_at, record FROM repos WHERE login = ?', (login,))
+        return {name: {'head_sha': head_sha, 'pushed_at': pushed_at, 'record': json.loads(record)}
+                for name, head_sha, pushed_at, record in rows}
+
+    def save(self, login, records):
+        # Commits found by this sync are reported once, not carried into the next run's unchanged repositories
+        now = time.time()
+        # A repository whose new commits couldn't be listed keeps its old head, so the next sync asks again
+        records = [record for record in records if 'new_commits_error' not in record]
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO repos (login, name, head_sha, pushed_at, record, synced_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                [(login, record['repo_name'], record['sha'], record['pushed_at'],
+                  json.dumps({key: value for key, value in record.items() if key != 'new_commits'}), now)
+                 for record in records])
@@ -1,174 +1,187 @@
-import requests
-import os
-import json
-import time
+import asyncio
+import aiohttp
 import logging
+import os
 from bs4 import BeautifulSoup
-from urllib.parse import urlencode
 from tkinter.filedialog import askdirectory
 import argparse
+from github_client import GithubClient
+from github_cache import ResponseCache, cache_file
+from github_output import UserSink
+from github_sync import CommitSyncStore, sync_file
+from github_checkpoint import CrawlCheckpoint
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class GithubScraper:
-    def __init__(self, query, output_dir, api_key, rate_limit_threshold=10, delay=5):
+    def __init__(self, query, output_dir, api_key, rate_limit_threshold=10, concurrency=4,
+                 cache_path=cache_file, fsync='batch', export_json=False, sync_path=None, resume=False):
         self.query = query
-        self.base_url = 'https://api.github.com/search/users?'
         self.api_key = api_key
-        self.headers = {
-            'Accept': 'application/vnd.github.v3+json',
-            'Authorization': f'token {self.api_key}'
-        }
         self.output_dir = output_dir
         self.rate_limit_threshold = rate_limit_threshold
-        self.delay = delay
+        self.concurrency = concurrency
+        self.cache_path = cache_path
+        self.fsync = fsync
+        self.export_json = export_json
+        # Set to keep per-repository watermarks, so refreshing tracked users only pays for what changed
+        self.sync_path = sync_path
+        self.sync = None
+        self.sink = None
+        self.per_page = 30
+        self.resume = resume
+        self.checkpoint_path = os.path.join(output_dir, 'github_users.checkpoint.json')
 
     def fetch_users(self):
-        params = {'q': self.query, 'per_page': 30}
-        users = []
-
-        while True:
-            logger.info(f"Fetching page: {params.get('page', 1)}")
+        return asyncio.run(self.fetch_users_async())
+
+    async def fetch_users_async(self):
+        processed = 0
+        self.sink = UserSink(self.output_dir, fsync=self.fsync)
+        checkpoint = self.open_checkpoint()
+        if checkpoint.complete:
+            logger.info(f"Checkpoint says the crawl of '{self.query}' is already complete")
+            self.finish_output()
+            return processed
+        cache = ResponseCache(self.cache_path) if self.cache_path else None
+        self.sync = CommitSyncStore(self.sync_path) if self.sync_path else None
+        # Search pages are fetched concurrently within the rate limit while earlier pages are processed
+        async with GithubClient(self.api_key, concurrency=self.concurrency,
+                                rate_limit_threshold=self.rate_limit_threshold, cache=cache) as client:
             try:
-                response = requests.get(self.base_url + urlencode(params), headers=self.headers, timeout=10)
-                response.raise_for_status()
-                self.check_rate_limit(response)
-                data = response.json()
-                users.extend(data['items'])
-                logger.info(f"Fetched {len(data['items'])} users")
-
-                # Process and save users after each page
-                users_with_details = self.fetch_and_parse_user_details(users)
-                self.save_users_incrementally(users_with_details)
-
-                # Reset users list for the next page
-                users = []
-
-                if 'next' not in response.links:
-                    break
-
-                params['page'] = params.get('page', 1) + 1
-                time.sleep(self.delay)
-
-            except requests.exceptions.HTTPError as e:
+                async for number, page in client.numbered_search_pages(
+                        'users', self.query, per_page=self.per_page,
+                        skip=checkpoint.done_pages, total_count=checkpoint.total_count):
+                    checkpoint.total_count = page.get('total_count', checkpoint.total_count)
+                    # Results shift between runs; users saved before a restart are not fetched again
+                    users = [user for user in page['items'] if user['login'] not in checkpoint.users]
+                    logger.info(f"Fetched page {number}: {len(users)} new users")
+
+                    # Process and save users after each page; profiles and commits are fetched side by side
+                    users_with_details, _ = await asyncio.gather(
+                        self.fetch_and_parse_user_details(client, users),
+                        self.fetch_latest_commits(client, users))
+                    self.save_users_incrementally(users_with_details)
+                    checkpoint.page_done(number, [user['login'] for user in users])
+                    processed += len(users)
+                checkpoint.finish()
+            except aiohttp.ClientResponseError as e:
                 logger.error(f"HTTP error: {e}")
-                break
-            except requests.exceptions.Timeout as e:
+            except asyncio.TimeoutError as e:
                 logger.error(f"Request timed out: {e}")
-                break
-            except requests.exceptions.RequestException as e:
+            except aiohttp.ClientError as e:
                 logger.error(f"Error fetching data: {e}")
-                break
-
+            finally:
+                if cache:
+                    cache.close()
+                if self.sync:
+                    self.sync.close()
+                self.finish_output()
+
+        if not checkpoint.complete:
+            logger.info(f"Stopped with {len(checkpoint.done_pages)} pages done; run again with --resume to continue")
+        return processed
+
+    def open_checkpoint(self):
+        if self.resume:
+            checkpoint = CrawlCheckpoint.load(self.checkpoint_path, self.query, self.per_page)
+            if checkpoint:
+                logger.info(f"Resuming '{self.query}': {len(checkpoint.done_pages)} pages and "
+                            f"{len(checkpoint.users)} users already done")
+                return checkpoint
+            logger.info(f"No checkpoint to resume for '{self.query}', starting from page 1")
+        return CrawlCheckpoint(self.checkpoint_path, self.query, self.per_page)
+
+    async def fetch_and_parse_user_details(self, client, users):
+        # Profile pages share the client's pool and limits, so they load concurrently without a fixed delay
+        await asyncio.gather(*(self.fetch_user_details(client, user) for user in users))
         return users
 
-    def fetch_and_parse_user_details(self, users):
-        for user in users:
-            profile_url = user['html_url']
-            logger.info(f"Processing user: {profile_url}")
-
-            try:
-                response = requests.get(profile_url, timeout=10)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                # Fetching follower count
-                follower_link = soup.select_one('li.vcard-detail:nth-child(2) > a:nth-child(2)')
-                if follower_link:
-                    follower_count = follower_link.text.strip()
-                    user['follower_count'] = follower_count
-                else:
-                    user['follower_count'] = 'N/A'
-
-                # Fetching email address
-                email_link = soup.select_one('a[href^="mailto:"]')
-                if email_link:
-                    email_address = email_link.get('href').replace('mailto:', '')
-                    user['email_address'] = email_address
-                else:
-                    user['email_address'] = 'N/A'
-
-                # Fetching vCard data
-                vcard = soup.select_one('.vcard-details')
-                if vcard:
-                    user['name'] = vcard.select_one('.p-name').text.strip() if vcard.select_one('.p-name') else 'N/A'
-                    user['company'] = vcard.select_one('.p-org').text.strip() if vcard.select_one('.p-org') else 'N/A'
-                    user['location'] = vcard.select_one('.p-label').text.strip() if vcard.select_one('.p-label') else 'N/A'
-                    user['join_date'] = soup.select_one('.join-date').text.strip() if soup.select_one('.join-date') else 'N/A'
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching user details for {profile_url}: {e}")
-                # Marking error in each field in case of an exception
-                user['follower_count'] = 'Error'
-                user['email_address'] = 'Error'
-                user['name'] = 'Error'
-                user['company'] = 'Error'
-                user['location'] = 'Error'
-                user['join_date'] = 'Error'
-
-            self.fetch_latest_commits(user)
-            time.sleep(self.delay)
-
-        return users
+    async def fetch_user_details(self, client, user):
+        profile_url = user['html_url']
+        logger.info(f"Processing user: {profile_url}")
 
-    def fetch_latest_commits(self, user):
-        repos_url = f"https://api.github.com/users/{user['login']}/repos"
         try:
-            response = requests.get(repos_url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            repos = response.json()
-
-            user['latest_commits'] = []
-            for repo in repos:
-                commits_url = f"https://api.github.com/repos/{user['login']}/{repo['name']}/commits"
-                commit_response = requests.get(commits_url, headers=self.headers, timeout=10)
-                commit_response.raise_for_status()
-                commits = commit_response.json()
-                if commits:
-                    latest_commit = commits[0]  # assuming the first commit is the latest
-                    user['latest_commits'].append({
-                        'repo_name': repo['name'],
-                        'commit_url': latest_commit['html_url'],
-                        'commit_message': latest_commit['commit']['message']
-                    })
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching repository details for {user['login']}: {e}")
+            soup = BeautifulSoup(await client.get_text(profile_url), 'html.parser')
+
+            # Fetching follower count
+            follower_link = soup.select_one('li.vcard-detail:nth-child(2) > a:nth-child(2)')
+            if follower_link:
+                follower_count = follower_link.text.strip()
+                user['follower_count'] = follower_count
+            else:
+                user['follower_count'] = 'N/A'
+
+            # Fetching email address
+            email_link = soup.select_one('a[href^="mailto:"]')
+            if email_link:
+                email_address = email_link.get('href').replace('mailto:', '')
+                user['email_address'] = email_address
+            else:
+                user['email_address'] = 'N/A'
+
+            # Fetching vCard data
+            vcard = soup.select_one('.vcard-details')
+            if vcard:
+                user['name'] = vcard.select_one('.p-name').text.strip() if vcard.select_one('.p-name') else 'N/A'
+                user['company'] = vcard.select_one('.p-org').text.strip() if vcard.select_one('.p-org') else 'N/A'
+                user['location'] = vcard.select_one('.p-label').text.strip() if vcard.select_one('.p-label') else 'N/A'
+                user['join_date'] = soup.select_one('.join-date').text.strip() if soup.select_one('.join-date') else 'N/A'
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error fetching user details for {profile_url}: {e}")
+            # Marking error in each field in case of an exception
+            user['follower_count'] = 'Error'
+            user['email_address'] = 'Error'
+            user['name'] = 'Error'
+            user['company'] = 'Error'
+            user['location'] = 'Error'
+            user['join_date'] = 'Error'
+
+    async def fetch_latest_commits(self, client, users):
+        # One batched GraphQL query covers the default-branch heads of many users' repositories
+        try:
+            commits = await client.latest_commits([user['login'] for user in users], sync=self.sync)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error fetching repository details for {len(users)} users: {e}")
+            return
+        for user in users:
+            user['latest_commits'] = commits[user['login']]
 
     def save_users_incrementally(self, users):
-        file_path = os.path.join(self.output_dir, 'github_users.json')
-        # Check if file exists and read existing data if it does
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-                existing_data.extend(users)
-        else:
-            existing_data = users
-
-        # Save the updated data
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, ensure_ascii=False, indent=4)
-
-        logger.info(f"Saved incremental data to {file_path}")
-
-    def check_rate_limit(self, response):
-        rate_limit_remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-        if rate_limit_remaining < self.rate_limit_threshold:
-            sleep_time = 60  # in seconds
-            logger.info(f"Approaching rate limit. Sleeping for {sleep_time} seconds.")
-            time.sleep(sleep_time)
+        # Appends only this page, so saving costs the same however many users are already saved
+        self.sink.append(users)
+
+    def finish_output(self):
+        # Users seen again (e.g. a re-run of the query) are merged into one record each
+        self.sink.compact()
+        if self.export_json:
+            self.sink.export_json()
+        self.sink.close()
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='GitHub Scraper')
     parser.add_argument('query', help='GitHub search query')
+    parser.add_argument('--cache-file', default=cache_file, help='ETag cache of API responses')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every response in full')
+    parser.add_argument('--sync', action='store_true',
+                        help='Only fetch commits of repositories pushed to since the last --sync run')
+    parser.add_argument('--sync-file', default=sync_file, help='Per-repository commit watermarks for --sync')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last run of this query from its checkpoint in the output directory')
+    parser.add_argument('--fsync', choices=('record', 'batch', 'none'), default='batch',
+                        help='Sync github_users.jsonl after every record, every page, or leave it to the OS')
+    parser.add_argument('--export-json', action='store_true', help='Also write github_users.json as one JSON array')
     return parser.parse_args()
 
 if __name__ == '__main__':
     args = parse_arguments()
     api_key = input("Enter your GitHub API key: ")
     output_dir = askdirectory(title='Choose Directory to Save Information')
-    scraper = GithubScraper(args.query, output_dir, api_key)
+    scraper = GithubScraper(args.query, output_dir, api_key, cache_path=None if args.no_cache else args.cache_file,
+                            fsync=args.fsync, export_json=args.export_json,
+                            sync_path=args.sync_file if args.sync else None, resume=args.resume)
     users = scraper.fetch_users()
     # No need to call fetch_and_parse_user_details or save_users here as it's done incrementally